@@ -0,0 +1,93 @@
+import hashlib
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+
+def get_cache_version(namespace):
+    """Return the current version number for a cache namespace"""
+    return cache.get_or_set(f'version:{namespace}', 1, None)
+
+
+def bump_cache_version(namespace):
+    """Invalidate every key in a namespace by moving to a new version"""
+    key = f'version:{namespace}'
+    cache.add(key, 1, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key was evicted between add() and incr()
+        cache.set(key, 2, None)
+        return 2
+
+
+def versioned_key(namespace, *parts):
+    """Build a cache key that is invalidated when the namespace version changes"""
+    version = get_cache_version(namespace)
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{namespace}:v{version}:{suffix}'
+
+
+def get_release_id():
+    """Identify the deployed build: RELEASE_ID, else the static manifest's hash"""
+    return settings.RELEASE_ID or getattr(staticfiles_storage, 'manifest_hash', '')
+
+
+class CachedPageMixin:
+    """Serve fully rendered GET responses from the cache
+
+    Views define ``get_cache_namespace()``; bumping that namespace version
+    invalidates every cached rendering of the view, and keys include the
+    release id so a deploy never serves pages rendered by the old build.
+    Responses carry an ETag hashed from the rendered content and stored
+    with it, so browsers revalidate with a 304 that costs no rendering or
+    database work while the page is cached. Requests that carry flash
+    messages are rendered normally so messages are never cached.
+    """
+    cache_namespace = None
+    cache_timeout = None
+
+    def get_cache_namespace(self):
+        return self.cache_namespace
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+    def get(self, request, *args, **kwargs):
+        namespace = self.get_cache_namespace()
+        if namespace is None or len(get_messages(request)):
+            response = super().get(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        key = versioned_key(namespace, 'page', get_release_id(), request.get_full_path())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, etag = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = super().get(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.status_code != 200:
+                return response
+            etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+            cache.set(
+                key,
+                (response.content, response['Content-Type'], etag),
+                self.get_cache_timeout()
+            )
+
+        not_modified = get_conditional_response(request, etag=etag)
+        return self.add_validators(not_modified or response, etag)
+
+    def add_validators(self, response, etag):
+        response['ETag'] = etag
+        # Always revalidate: the ETag changes as soon as the page does
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -1,10 +1,34 @@
-from PIL import Image, ImageFilter, ImageOps
-import numpy as np
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from .jpeg_encoding import encode_adaptive_jpeg
+
+# Pillow and NumPy are imported inside the filters that need them so that
+# importing this module (e.g. via the URLconf) stays cheap for workers
+# that only serve pages
 
 
 class ImageProcessor:
     """Image processing class with various filter implementations"""
     
+    # Bump a filter's version whenever a change to it alters its output;
+    # rows stamped with an older version are picked up by reprocess_stale
+    FILTER_VERSIONS = {
+        'gray': 1,
+        'sepia': 1,
+        'poster': 1,
+        'blur': 1,
+        'edge': 1,
+        'solar': 1,
+        'lut': 1,
+    }
+    
+    # Source formats whose extra frames are animation frames; MPO and TIFF
+    # also have several frames, but they are alternate views or pages
+    ANIMATED_FORMATS = ('GIF', 'WEBP', 'PNG')
+    
     @staticmethod
     def apply_grayscale(image):
         """Convert image to grayscale"""
@@ -13,6 +37,9 @@ class ImageProcessor:
     @staticmethod
     def apply_sepia(image):
         """Apply sepia filter to image"""
+        from PIL import Image
+        import numpy as np
+        
         # Convert to RGB if not already
         if image.mode != 'RGB':
             image = image.convert('RGB')
@@ -46,11 +73,15 @@ class ImageProcessor:
     @staticmethod
     def apply_blur(image):
         """Apply blur filter"""
+        from PIL import ImageFilter
+        
         return image.filter(ImageFilter.BLUR)
     
     @staticmethod
     def apply_edge(image):
         """Apply edge detection filter"""
+        from PIL import ImageFilter
+        
         # Convert to grayscale first
         if image.mode != 'L':
             image = image.convert('L')
@@ -61,6 +92,8 @@ class ImageProcessor:
     @staticmethod
     def apply_solar(image):
         """Apply solarization effect"""
+        from PIL import ImageOps
+        
         # Convert to RGB if not already
         if image.mode != 'RGB':
             image = image.convert('RGB')
@@ -68,9 +101,22 @@ class ImageProcessor:
         # Apply solarization
         return ImageOps.solarize(image, threshold=128)
     
+    @staticmethod
+    def apply_lut(image, lut):
+        """Apply a parsed 3D colour lookup table"""
+        if lut is None:
+            raise ValueError("The lut filter needs a colour lookup table")
+        return lut.apply(image)
+    
     @classmethod
-    def process_image(cls, image, filter_type):
-        """Process image with specified filter"""
+    def process_image(cls, image, filter_type, lut=None):
+        """Process image with specified filter
+        
+        ``lut`` is the CubeLUT applied by the ``lut`` filter.
+        """
+        if filter_type == 'lut':
+            return cls.apply_lut(image, lut)
+        
         filter_methods = {
             'gray': cls.apply_grayscale,
             'sepia': cls.apply_sepia,
@@ -84,3 +130,207 @@ class ImageProcessor:
             raise ValueError(f"Unknown filter type: {filter_type}")
         
         return filter_methods[filter_type](image)
+    
+    @classmethod
+    def get_filter_version(cls, filter_type):
+        """Return the current implementation version of a filter"""
+        if filter_type not in cls.FILTER_VERSIONS:
+            raise ValueError(f"Unknown filter type: {filter_type}")
+        return cls.FILTER_VERSIONS[filter_type]
+    
+    @staticmethod
+    def encode_jpeg(image, **options):
+        """Encode image as JPEG bytes"""
+        # Convert to RGB if necessary (JPEG doesn't support RGBA)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGB')
+        
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', **options)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def encode_image(image, output_format, **options):
+        """Encode image in the given Pillow format as bytes"""
+        buffer = BytesIO()
+        image.save(buffer, output_format, **options)
+        return buffer.getvalue()
+    
+    @classmethod
+    def process_frames(cls, frames, filter_type, workers=None, lut=None):
+        """Apply a filter to a stream of frames in parallel
+        
+        Frames are filtered on a thread pool (Pillow and NumPy release the
+        GIL in their C loops, so no frame has to be copied to another
+        process). At most two frames per worker are in flight, and results
+        are yielded in order carrying their original duration.
+        """
+        workers = workers or min(4, os.cpu_count() or 1)
+        pending = deque()
+        
+        def finish(future, duration):
+            result = future.result()
+            result.info['duration'] = duration
+            return result
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for frame in frames:
+                duration = frame.info.get('duration', 100)
+                pending.append((pool.submit(cls.process_image, frame, filter_type, lut), duration))
+                if len(pending) >= workers * 2:
+                    yield finish(*pending.popleft())
+            while pending:
+                yield finish(*pending.popleft())
+    
+    @staticmethod
+    def write_gif(frames, fp, loop=None):
+        """Write frames to fp as an animated GIF, one frame at a time
+        
+        Pillow's GIF writer collects every frame before writing anything,
+        so frames are encoded here with its getheader()/getdata() helpers
+        instead. As Pillow does by default, later frames only store the
+        bounding box of what changed since the previous frame, with
+        unchanged pixels inside it made transparent, and identical frames
+        extend the previous frame's duration. Only the previous frame and
+        the one waiting to be written are held in memory. Without ``loop``
+        the animation plays once.
+        """
+        from PIL import GifImagePlugin, Image, ImageChops
+        
+        def palettize(frame, unchanged=None):
+            """Return the frame as a P image, and its transparent index
+            
+            ``unchanged`` masks pixels to write as transparent, showing the
+            previous frame through them.
+            """
+            if frame.mode == 'P' and unchanged is None:
+                return frame, frame.info.get('transparency')
+            if frame.mode in ('RGBA', 'LA', 'PA'):
+                image = frame.convert('RGBA').convert('P', palette=Image.Palette.ADAPTIVE)
+                transparency = next(
+                    (index for rgba, index in image.palette.colors.items() if rgba[3] == 0), None
+                )
+                return image, transparency
+            if unchanged is None:
+                # Grayscale frames get a palette too; after an L first frame,
+                # Pillow decodes later frames as L, ignoring their palettes
+                return frame.quantize(256), None
+            # Leave a palette slot free for the transparent index
+            image = frame.quantize(255)
+            palette = image.getpalette()
+            transparency = len(palette) // 3
+            image.putpalette(palette + [0, 0, 0])
+            image.paste(transparency, mask=unchanged)
+            return image, transparency
+        
+        def write(image, offset, params):
+            for data in GifImagePlugin.getdata(image, offset, **params):
+                fp.write(data)
+        
+        previous = None
+        pending = None
+        for frame in frames:
+            duration = frame.info.get('duration', 100)
+            if previous is None:
+                image, transparency = palettize(frame)
+                header, _ = GifImagePlugin.getheader(image, info={'loop': loop, 'duration': duration})
+                for data in header:
+                    fp.write(data)
+                pending = [image, (0, 0), {'duration': duration}]
+            else:
+                bbox = (0, 0) + frame.size
+                unchanged = None
+                if frame.mode == previous.mode:
+                    difference = ImageChops.difference(previous, frame)
+                    bbox = difference.getbbox(alpha_only=False)
+                    if bbox is None:
+                        pending[2]['duration'] += duration
+                        continue
+                    if frame.mode in ('L', 'RGB'):
+                        changed = difference.crop(bbox).point(lambda value: 255 if value else 0).convert('L')
+                        unchanged = changed.point(lambda value: 255 if value == 0 else 0, '1')
+                write(*pending)
+                image, transparency = palettize(frame.crop(bbox), unchanged)
+                pending = [image, bbox[:2], {'duration': duration, 'include_color_table': True}]
+            if transparency is not None:
+                pending[2]['transparency'] = transparency
+            previous = frame
+        write(*pending)
+        fp.write(b';')
+    
+    @classmethod
+    def encode_animation(cls, frames, output_format='GIF', loop=None):
+        """Encode an iterable of frames as an animated GIF or WebP
+        
+        GIF frames are written as they arrive (see write_gif). Pillow's
+        WebP encoder needs every frame up front, so render() bounds the
+        size of WebP animations before decoding them. ``loop`` is the
+        source's loop count (0 repeats forever); None plays once.
+        """
+        frames = iter(frames)
+        buffer = BytesIO()
+        if output_format == 'GIF':
+            cls.write_gif(frames, buffer, loop)
+        else:
+            first = next(frames)
+            rest = list(frames)
+            durations = [frame.info['duration'] for frame in [first] + rest]
+            first.save(
+                buffer, 'WEBP', save_all=True, append_images=rest,
+                duration=durations, loop=1 if loop is None else loop
+            )
+        return buffer.getvalue()
+    
+    @classmethod
+    def render(cls, source, filter_type, lut=None, progress=None, encoding=None):
+        """Filter and encode a LazyImage, returning (bytes, file extension)
+        
+        Animated GIF, WebP and PNG (APNG) sources keep their animation:
+        WebP input is written as animated WebP and the others as animated
+        GIF, with the source's loop count. Other multi-frame files, such
+        as MPO photos from phone cameras, are rendered from their first
+        frame like still images. Single frames
+        are encoded as JPEG, at an adaptively chosen quality unless
+        JPEG_ADAPTIVE is off; the chosen 'jpeg_quality' and 'jpeg_ssim'
+        are stored in the ``encoding`` dict when one is passed.
+        ``progress``, if given, is called with the stages 'decoded',
+        'filtering' and 'encoding' as they start.
+        """
+        progress = progress or (lambda stage: None)
+        metadata = source.metadata
+        if metadata.get('is_animated') and metadata['format'] in cls.ANIMATED_FORMATS:
+            # Frames stream through decode, filter and encode together, so
+            # each stage is reported when its first frame reaches it
+            def announce(frames, *stages):
+                for index, frame in enumerate(frames):
+                    if index == 0:
+                        for stage in stages:
+                            progress(stage)
+                    yield frame
+            
+            output_format = 'WEBP' if source.metadata['format'] == 'WEBP' else 'GIF'
+            if output_format == 'WEBP':
+                pixels = source.metadata['n_frames'] * source.width * source.height
+                if pixels > settings.MAX_BUFFERED_ANIMATION_PIXELS:
+                    raise ValueError(
+                        f"Animated WebP too large to process "
+                        f"({source.metadata['n_frames']} frames of {source.width}x{source.height})"
+                    )
+            frames = announce(source.frames(), 'decoded', 'filtering')
+            frames = announce(cls.process_frames(frames, filter_type, lut=lut), 'encoding')
+            options = {}
+            if metadata.get('loop') is not None:
+                options['loop'] = metadata['loop']
+            content = cls.encode_animation(frames, output_format, **options)
+            return content, output_format.lower()
+        image = source.image
+        progress('decoded')
+        progress('filtering')
+        filtered = cls.process_image(image, filter_type, lut)
+        progress('encoding')
+        if not settings.JPEG_ADAPTIVE:
+            return cls.encode_jpeg(filtered), 'jpg'
+        content, params = encode_adaptive_jpeg(filtered)
+        if encoding is not None:
+            encoding.update(jpeg_quality=params['quality'], jpeg_ssim=params['ssim'])
+        return content, 'jpg'
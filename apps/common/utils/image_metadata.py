@@ -0,0 +1,112 @@
+# EXIF Orientation tag and the transpose needed to display each value
+# upright (names of PIL.Image.Transpose members; Pillow is imported lazily)
+EXIF_ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: 'FLIP_LEFT_RIGHT',
+    3: 'ROTATE_180',
+    4: 'FLIP_TOP_BOTTOM',
+    5: 'TRANSPOSE',
+    6: 'ROTATE_270',
+    7: 'TRANSVERSE',
+    8: 'ROTATE_90',
+}
+
+
+def read_image_metadata(fileobj):
+    """Read dimensions, format, mode and orientation from the file header
+
+    ``Image.open`` only parses headers, so no pixel data is decoded here.
+    Width and height are reported as displayed, i.e. after applying the
+    EXIF orientation. The file position is restored afterwards.
+    """
+    from PIL import Image
+    
+    position = fileobj.tell()
+    try:
+        image = Image.open(fileobj)
+        width, height = image.size
+        try:
+            orientation = int(image.getexif().get(EXIF_ORIENTATION_TAG, 1))
+        except (TypeError, ValueError):
+            orientation = 1
+        if orientation not in ORIENTATION_TRANSPOSE:
+            orientation = 1
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+        return {
+            'width': width,
+            'height': height,
+            'format': image.format or '',
+            'mode': image.mode,
+            'orientation': orientation,
+            'n_frames': getattr(image, 'n_frames', 1),
+            'is_animated': getattr(image, 'is_animated', False),
+            # None when the file sets no loop count, i.e. plays once
+            'loop': image.info.get('loop'),
+        }
+    finally:
+        fileobj.seek(position)
+
+
+class LazyImage:
+    """Image handle that defers pixel decoding until first access
+
+    Metadata is available immediately from the header; ``image`` decodes
+    on first use and applies the EXIF orientation as part of that decode,
+    so callers never see (or transpose) the sideways pixels.
+    """
+
+    def __init__(self, fileobj, metadata=None):
+        self.fileobj = fileobj
+        self.metadata = metadata or read_image_metadata(fileobj)
+        self._image = None
+
+    @property
+    def width(self):
+        return self.metadata['width']
+
+    @property
+    def height(self):
+        return self.metadata['height']
+
+    def decode(self, max_size=None):
+        """Decode pixels, optionally letting the decoder downscale on the fly"""
+        from PIL import Image
+        
+        self.fileobj.seek(0)
+        image = Image.open(self.fileobj)
+        orientation = self.metadata['orientation']
+        if max_size and image.format == 'JPEG':
+            # draft() works in stored (unrotated) coordinates
+            if orientation in (5, 6, 7, 8):
+                max_size = (max_size[1], max_size[0])
+            image.draft(image.mode, max_size)
+        image.load()
+        if orientation in ORIENTATION_TRANSPOSE:
+            image = image.transpose(Image.Transpose[ORIENTATION_TRANSPOSE[orientation]])
+        return image
+
+    def frames(self):
+        """Yield every frame decoded and oriented, one at a time
+
+        Each frame is an independent RGB(A) copy carrying its ``duration``,
+        so only frames still referenced by the caller stay in memory.
+        """
+        from PIL import Image, ImageSequence
+        
+        self.fileobj.seek(0)
+        image = Image.open(self.fileobj)
+        orientation = self.metadata['orientation']
+        for frame in ImageSequence.Iterator(image):
+            has_alpha = 'transparency' in frame.info or frame.mode in ('RGBA', 'LA', 'PA')
+            copy = frame.convert('RGBA' if has_alpha else 'RGB')
+            if orientation in ORIENTATION_TRANSPOSE:
+                copy = copy.transpose(Image.Transpose[ORIENTATION_TRANSPOSE[orientation]])
+            copy.info['duration'] = frame.info.get('duration', 100)
+            yield copy
+    
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = self.decode()
+        return self._image
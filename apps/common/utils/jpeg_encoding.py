@@ -0,0 +1,181 @@
+from functools import lru_cache
+from io import BytesIO
+from django.conf import settings
+
+# Quality is searched on a proxy of at most PROXY_TILES x PROXY_TILES tiles
+# of TILE_SIZE pixels cut from the full-resolution image. Tiles are aligned
+# to the 16-pixel JPEG block grid, so each one compresses as it does in the
+# full image, which a downscaled copy does not
+PROXY_TILES = 8
+TILE_SIZE = 64
+
+# SSIM over 8x8 windows (as in Wang et al. 2004) placed every 4 pixels, so
+# windows both fill and straddle JPEG blocks; constants are for 8-bit data
+SSIM_STEP = 4
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+# Full-size re-encodes allowed when the proxy's byte estimate overshoots
+BUDGET_RETRIES = 3
+
+
+def to_jpeg_mode(image):
+    if image.mode in ('RGB', 'L', 'CMYK'):
+        return image
+    return image.convert('RGB')
+
+
+def encode(image, quality, optimize=True):
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, optimize=optimize)
+    return buffer.getvalue()
+
+
+def tile_proxy(image):
+    """Mosaic of block-aligned tiles spread evenly over image
+
+    Images no larger than the mosaic, or narrower than a tile, are used as
+    they are.
+    """
+    from PIL import Image
+
+    width, height = image.size
+    columns = min(PROXY_TILES, width // TILE_SIZE)
+    rows = min(PROXY_TILES, height // TILE_SIZE)
+    if not (columns and rows) or (columns * TILE_SIZE >= width and rows * TILE_SIZE >= height):
+        return image
+
+    def offsets(count, length):
+        step = (length - TILE_SIZE) / max(count - 1, 1)
+        return [int(index * step) // 16 * 16 for index in range(count)]
+
+    proxy = Image.new(image.mode, (columns * TILE_SIZE, rows * TILE_SIZE))
+    for row, top in enumerate(offsets(rows, height)):
+        for column, left in enumerate(offsets(columns, width)):
+            tile = image.crop((left, top, left + TILE_SIZE, top + TILE_SIZE))
+            proxy.paste(tile, (column * TILE_SIZE, row * TILE_SIZE))
+    return proxy
+
+
+def window_means(values):
+    """Means of the 8x8 windows at every SSIM_STEP pixels of a float32 array
+
+    Pillow's reduce() averages the 4x4 cells in C; each window is then the
+    mean of a 2x2 group of cells.
+    """
+    import numpy as np
+    from PIL import Image
+
+    cells = np.asarray(Image.fromarray(values, 'F').reduce(SSIM_STEP))
+    return (cells[:-1, :-1] + cells[1:, :-1] + cells[:-1, 1:] + cells[1:, 1:]) / 4
+
+
+def ssim(reference, candidate):
+    """Mean structural similarity of two same-sized grayscale images"""
+    import numpy as np
+
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    height = a.shape[0] // SSIM_STEP * SSIM_STEP
+    width = a.shape[1] // SSIM_STEP * SSIM_STEP
+    if height < 2 * SSIM_STEP or width < 2 * SSIM_STEP:
+        return 1.0 if np.array_equal(a, b) else 0.0
+    a, b = a[:height, :width], b[:height, :width]
+
+    mean_a, mean_b = window_means(a), window_means(b)
+    var_a = window_means(a * a) - mean_a ** 2
+    var_b = window_means(b * b) - mean_b ** 2
+    covariance = window_means(a * b) - mean_a * mean_b
+    ssim_map = (
+        (2 * mean_a * mean_b + SSIM_C1) * (2 * covariance + SSIM_C2)
+        / ((mean_a ** 2 + mean_b ** 2 + SSIM_C1) * (var_a + var_b + SSIM_C2))
+    )
+    return float(ssim_map.mean())
+
+
+def lowest_quality(low, high, acceptable):
+    """Binary search for the lowest quality in [low, high] that is acceptable
+
+    Acceptability must be monotonic in quality. Returns None when no
+    quality in the range is acceptable.
+    """
+    best = None
+    while low <= high:
+        middle = (low + high) // 2
+        if acceptable(middle):
+            best = middle
+            high = middle - 1
+        else:
+            low = middle + 1
+    return best
+
+
+def highest_quality(low, high, acceptable):
+    """Binary search for the highest quality in [low, high] that is acceptable, or None"""
+    best = None
+    while low <= high:
+        middle = (low + high) // 2
+        if acceptable(middle):
+            best = middle
+            low = middle + 1
+        else:
+            high = middle - 1
+    return best
+
+
+def encode_adaptive_jpeg(image, target_ssim=None, max_bytes=None, min_quality=None, max_quality=None):
+    """Encode image as JPEG at the lowest quality that still looks the same
+
+    The quality is binary-searched on a tile proxy (see tile_proxy) for
+    the lowest setting whose luma SSIM is at least ``target_ssim``. With
+    ``max_bytes``, the quality is lowered further until the full image
+    fits the budget: proxy sizes are scaled by the full/proxy size ratio
+    measured at the current quality and each estimate is checked with a
+    real encode. A budget that even ``min_quality`` exceeds is not met.
+    Returns (bytes, {'quality': ..., 'ssim': ...}), where ssim is the
+    proxy's at the chosen quality.
+    """
+    from PIL import Image
+
+    target_ssim = settings.JPEG_TARGET_SSIM if target_ssim is None else target_ssim
+    max_bytes = settings.JPEG_MAX_BYTES if max_bytes is None else max_bytes
+    min_quality = min_quality or settings.JPEG_MIN_QUALITY
+    max_quality = max_quality or settings.JPEG_MAX_QUALITY
+
+    image = to_jpeg_mode(image)
+    proxy = tile_proxy(image)
+    luma = proxy.convert('L')
+
+    @lru_cache(maxsize=None)
+    def proxy_ssim(quality):
+        # Luma is quantised the same way with or without chroma, so the
+        # grayscale proxy gives the same SSIM for half the work. Huffman
+        # optimisation does not change pixels
+        decoded = Image.open(BytesIO(encode(luma, quality, optimize=False)))
+        return ssim(luma, decoded)
+
+    @lru_cache(maxsize=None)
+    def proxy_size(quality):
+        return len(encode(proxy, quality))
+
+    quality = max_quality
+    if target_ssim:
+        quality = lowest_quality(
+            min_quality, max_quality, lambda q: proxy_ssim(q) >= target_ssim
+        ) or max_quality
+    content = encode(image, quality)
+
+    if max_bytes and len(content) > max_bytes and quality > min_quality:
+        # Scale proxy sizes by the ratio seen at this quality, then search
+        # again below it; real encodes confirm the estimate
+        for _ in range(BUDGET_RETRIES):
+            ratio = len(content) / proxy_size(quality)
+            estimate = highest_quality(
+                min_quality, quality - 1, lambda q: proxy_size(q) * ratio <= max_bytes
+            )
+            quality = estimate or min_quality
+            content = encode(image, quality)
+            if len(content) <= max_bytes or quality == min_quality:
+                break
+
+    return content, {'quality': quality, 'ssim': round(proxy_ssim(quality), 4)}
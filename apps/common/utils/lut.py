@@ -0,0 +1,120 @@
+# Pillow's Color3DLUT filter accepts at most 65 points per axis
+MIN_LUT_SIZE = 2
+MAX_LUT_SIZE = 65
+
+
+class CubeLUT:
+    """A parsed 3D colour lookup table
+
+    ``table`` is a float32 array of ``size ** 3`` RGB rows with red varying
+    fastest, the order used by both the .cube format and Pillow. Instances
+    pickle compactly, so they can be kept in the shared cache.
+    """
+
+    def __init__(self, size, table, domain_min=(0.0, 0.0, 0.0), domain_max=(1.0, 1.0, 1.0), title=''):
+        self.size = size
+        self.table = table
+        self.domain_min = tuple(domain_min)
+        self.domain_max = tuple(domain_max)
+        self.title = title
+
+    def to_filter(self):
+        """Return a Pillow filter applying this table"""
+        from PIL import ImageFilter
+
+        return ImageFilter.Color3DLUT(self.size, self.table, _copy_table=False)
+
+    def input_mapping(self):
+        """Return a 768-entry point() table mapping the input domain to 0-255
+
+        Returns None when the domain is the default [0, 1].
+        """
+        if self.domain_min == (0.0, 0.0, 0.0) and self.domain_max == (1.0, 1.0, 1.0):
+            return None
+        mapping = []
+        for low, high in zip(self.domain_min, self.domain_max):
+            for value in range(256):
+                scaled = (value / 255 - low) / (high - low)
+                mapping.append(round(min(max(scaled, 0.0), 1.0) * 255))
+        return mapping
+
+    def apply(self, image):
+        """Colour-grade an RGB or RGBA image
+
+        Pillow interpolates the table trilinearly in C, and alpha is kept.
+        """
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+        mapping = self.input_mapping()
+        if mapping is not None:
+            if image.mode == 'RGBA':
+                mapping = mapping + list(range(256))
+            image = image.point(mapping)
+        return image.filter(self.to_filter())
+
+
+def parse_vector(values, keyword):
+    try:
+        vector = tuple(float(value) for value in values)
+    except ValueError:
+        vector = ()
+    if len(vector) != 3:
+        raise ValueError(f"{keyword} needs three numbers")
+    return vector
+
+
+def parse_cube(text):
+    """Parse the text of an Adobe/Resolve .cube file into a CubeLUT
+
+    Raises ValueError for 1D LUTs, unsupported sizes and malformed data.
+    """
+    import numpy as np
+
+    size = None
+    title = ''
+    domain_min = (0.0, 0.0, 0.0)
+    domain_max = (1.0, 1.0, 1.0)
+    rows = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if not (line[0].isdigit() or line[0] in '-+.'):
+            keyword, _, value = line.partition(' ')
+            values = value.split()
+            if keyword == 'TITLE':
+                title = value.strip().strip('"')
+            elif keyword == 'LUT_3D_SIZE':
+                try:
+                    size = int(value)
+                except ValueError:
+                    raise ValueError(f"Invalid LUT_3D_SIZE on line {line_number}")
+            elif keyword == 'LUT_1D_SIZE':
+                raise ValueError('1D LUTs are not supported; export a 3D LUT')
+            elif keyword == 'DOMAIN_MIN':
+                domain_min = parse_vector(values, keyword)
+            elif keyword == 'DOMAIN_MAX':
+                domain_max = parse_vector(values, keyword)
+            elif keyword == 'LUT_3D_INPUT_RANGE':
+                low, high = parse_vector(values + values[-1:], keyword)[:2]
+                domain_min, domain_max = (low,) * 3, (high,) * 3
+            # Other keywords (e.g. LUT_IN_VIDEO_RANGE) do not affect the table
+            continue
+        rows.append(line)
+
+    if size is None:
+        raise ValueError('Missing LUT_3D_SIZE')
+    if not MIN_LUT_SIZE <= size <= MAX_LUT_SIZE:
+        raise ValueError(f"LUT_3D_SIZE must be between {MIN_LUT_SIZE} and {MAX_LUT_SIZE}")
+    if any(high <= low for low, high in zip(domain_min, domain_max)):
+        raise ValueError('DOMAIN_MAX must be greater than DOMAIN_MIN')
+    if len(rows) != size ** 3:
+        raise ValueError(f"Expected {size ** 3} table rows, found {len(rows)}")
+
+    try:
+        table = np.array(' '.join(rows).split(), dtype=np.float32)
+    except ValueError:
+        raise ValueError('Table rows must contain only numbers')
+    if table.size != size ** 3 * 3:
+        raise ValueError('Every table row must have exactly three values')
+    return CubeLUT(size, table.reshape(-1, 3), domain_min, domain_max, title)
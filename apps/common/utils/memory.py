@@ -0,0 +1,242 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from django.core.cache import cache
+
+# How often the background sampler reads the process RSS while a
+# profiled request runs
+RSS_SAMPLE_INTERVAL = 0.005
+
+# Upper bounds (in pixels) of the image size buckets used for aggregates
+SIZE_BUCKETS = (
+    (1_000_000, '<1MP'),
+    (4_000_000, '1-4MP'),
+    (12_000_000, '4-12MP'),
+    (24_000_000, '12-24MP'),
+)
+LARGEST_BUCKET = '24MP+'
+
+AGGREGATE_PREFIX = 'memprofile'
+AGGREGATE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def max_rss():
+    """High-water RSS of this process in bytes, or None where unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RSSSampler(threading.Thread):
+    """Polls the process RSS in the background and remembers the peak
+
+    Pillow allocates pixel buffers with plain malloc, which tracemalloc
+    does not see, so decoded images only show up in the RSS.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        super().__init__(name='rss-sampler', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.peak = current_rss() or 0
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = current_rss() or 0
+            if rss > self.peak:
+                self.peak = rss
+
+    def take_peak(self):
+        """Return the peak since the previous call and start a new window"""
+        rss = current_rss() or 0
+        peak = max(self.peak, rss)
+        self.peak = rss
+        return peak
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class MemoryProfile:
+    """Peak memory of one request, overall and per named stage
+
+    An instance does nothing until ``start()`` succeeds, so code can mark
+    stages unconditionally. tracemalloc is process-wide, so only one
+    request per process is profiled at a time; ``start()`` returns False
+    while another profile is running.
+    """
+
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.active = False
+        self.tags = {}
+        self.stages = []
+        self.stage_name = None
+
+    def start(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.traced_start = tracemalloc.get_traced_memory()[0]
+        self.traced_peak = 0
+        self.rss_start = current_rss()
+        self.rss_peak = self.rss_start or 0
+        self.max_rss_start = max_rss()
+        self.sampler = RSSSampler()
+        self.sampler.start()
+        self.started_at = time.perf_counter()
+        self.active = True
+        return True
+
+    def tag(self, **tags):
+        """Attach values (filter, dimensions...) used for logging and aggregation"""
+        if self.active:
+            self.tags.update(tags)
+
+    def take_peaks(self):
+        """Fold the current tracemalloc and RSS peaks into the request totals"""
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        rss_peak = self.sampler.take_peak()
+        self.traced_peak = max(self.traced_peak, traced_peak - self.traced_start)
+        self.rss_peak = max(self.rss_peak, rss_peak)
+        return traced_current, traced_peak, rss_peak
+
+    def begin(self, name):
+        """End the current stage, if any, and start a new one"""
+        if not self.active:
+            return
+        self.end_stage()
+        traced_current, _, _ = self.take_peaks()
+        self.stage_name = name
+        self.stage_started_at = time.perf_counter()
+        self.stage_traced_start = traced_current
+        self.stage_rss_start = current_rss()
+        self.stage_max_rss_start = max_rss()
+
+    def end_stage(self):
+        if not self.active or self.stage_name is None:
+            return
+        _, traced_peak, rss_peak = self.take_peaks()
+        rss_end = current_rss()
+        max_rss_end = max_rss()
+        self.stages.append({
+            'name': self.stage_name,
+            'ms': round((time.perf_counter() - self.stage_started_at) * 1000, 1),
+            'traced_peak': traced_peak - self.stage_traced_start,
+            'rss_peak': rss_peak,
+            'rss_delta': rss_end - self.stage_rss_start if rss_end and self.stage_rss_start else None,
+            'max_rss_growth': (
+                max_rss_end - self.stage_max_rss_start if max_rss_end and self.stage_max_rss_start else None
+            ),
+        })
+        self.stage_name = None
+
+    def finish(self):
+        """Stop profiling and return the measurements as a JSON-ready dict"""
+        if not self.active:
+            return None
+        try:
+            self.end_stage()
+            self.take_peaks()
+            self.sampler.stop()
+            rss_end = current_rss()
+            max_rss_end = max_rss()
+            record = {
+                'ms': round((time.perf_counter() - self.started_at) * 1000, 1),
+                'traced_peak': self.traced_peak,
+                'rss_start': self.rss_start,
+                'rss_end': rss_end,
+                'rss_peak': self.rss_peak,
+                'rss_growth': self.rss_peak - self.rss_start if self.rss_start else None,
+                'max_rss': max_rss_end,
+                'max_rss_growth': (
+                    max_rss_end - self.max_rss_start if max_rss_end and self.max_rss_start else None
+                ),
+                'stages': self.stages,
+            }
+            record.update(self.tags)
+            return record
+        finally:
+            if self.started_tracing:
+                tracemalloc.stop()
+            self.active = False
+            self.lock.release()
+
+
+def get_memory_profile(request):
+    """The request's MemoryProfile, or an inactive one outside the middleware"""
+    profile = getattr(request, 'memory_profile', None)
+    return profile if profile is not None else MemoryProfile()
+
+
+def size_bucket(width, height):
+    pixels = (width or 0) * (height or 0)
+    for limit, label in SIZE_BUCKETS:
+        if pixels < limit:
+            return label
+    return LARGEST_BUCKET
+
+
+def bucket_labels():
+    return [label for _, label in SIZE_BUCKETS] + [LARGEST_BUCKET]
+
+
+def aggregate_key(filter_type, bucket):
+    return f'{AGGREGATE_PREFIX}:{filter_type}:{bucket}'
+
+
+def record_aggregate(filter_type, bucket, record):
+    """Fold one profile into the running per-filter, per-size-bucket totals
+
+    Read-modify-write without a lock: profiles are sampled, so an
+    occasional lost update is acceptable.
+    """
+    key = aggregate_key(filter_type, bucket)
+    entry = cache.get(key) or {
+        'count': 0, 'rss_peak_max': 0, 'rss_growth_total': 0, 'rss_growth_max': 0,
+        'traced_peak_total': 0, 'traced_peak_max': 0, 'stages': {},
+    }
+    rss_growth = record['rss_growth'] or 0
+    entry['count'] += 1
+    entry['rss_peak_max'] = max(entry['rss_peak_max'], record['rss_peak'] or 0)
+    entry['rss_growth_total'] += rss_growth
+    entry['rss_growth_max'] = max(entry['rss_growth_max'], rss_growth)
+    entry['traced_peak_total'] += record['traced_peak']
+    entry['traced_peak_max'] = max(entry['traced_peak_max'], record['traced_peak'])
+    for stage in record['stages']:
+        totals = entry['stages'].setdefault(stage['name'], {'count': 0, 'traced_peak_max': 0, 'rss_delta_max': 0})
+        totals['count'] += 1
+        totals['traced_peak_max'] = max(totals['traced_peak_max'], stage['traced_peak'])
+        totals['rss_delta_max'] = max(totals['rss_delta_max'], stage['rss_delta'] or 0)
+    cache.set(key, entry, AGGREGATE_TIMEOUT)
+
+
+def get_aggregates(filter_types):
+    """Return {(filter_type, bucket): totals} for every combination with data"""
+    keys = {
+        aggregate_key(filter_type, bucket): (filter_type, bucket)
+        for filter_type in filter_types
+        for bucket in bucket_labels()
+    }
+    return {keys[key]: entry for key, entry in cache.get_many(list(keys)).items()}
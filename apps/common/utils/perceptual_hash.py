@@ -0,0 +1,102 @@
+from itertools import combinations
+
+# dHash compares each pixel of a (HASH_SIZE + 1) x HASH_SIZE grayscale
+# thumbnail with its right-hand neighbour, giving a 64-bit hash that
+# survives recompression, resizing and small colour shifts
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+
+def dhash(image):
+    """Return the 64-bit difference hash of a Pillow image as an unsigned int"""
+    from PIL import Image
+
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def image_dhash(lazy_img):
+    """Hash a LazyImage, decoding as little as possible
+
+    JPEGs are decoded at reduced scale through ``draft()``. Other formats
+    have to be decoded fully, so the decode cached on the LazyImage is
+    used and later filtering does not decode again.
+    """
+    if lazy_img.metadata['format'] == 'JPEG':
+        return dhash(lazy_img.decode(max_size=(HASH_SIZE * 8, HASH_SIZE * 8)))
+    return dhash(lazy_img.image)
+
+
+def to_signed(value):
+    """Map an unsigned 64-bit hash into the range of a signed BigIntegerField"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def is_informative(value):
+    """False for hashes of flat or pure-gradient images, which match too easily"""
+    bits = bin(value).count('1')
+    return 4 <= bits <= HASH_BITS - 4
+
+
+class MultiIndexHash:
+    """Multi-index hashing for Hamming-radius search over 64-bit hashes
+
+    Each hash is split into CHUNKS 16-bit substrings, each indexed in its
+    own table. By the pigeonhole principle two hashes within distance r
+    differ by at most r // CHUNKS bits in at least one substring, so a
+    search only probes the few substrings that close to the query's and
+    verifies the resulting candidates.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = HASH_BITS // CHUNKS
+
+    def __init__(self):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.size = 0
+
+    def chunks(self, value):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (self.CHUNK_BITS * index)) & mask for index in range(self.CHUNKS)]
+
+    def add(self, value, item):
+        for table, chunk in zip(self.tables, self.chunks(value)):
+            table.setdefault(chunk, []).append((value, item))
+        self.size += 1
+
+    def neighbours(self, chunk, radius):
+        """Yield every chunk value within ``radius`` bits of chunk"""
+        yield chunk
+        for flips in range(1, radius + 1):
+            for positions in combinations(range(self.CHUNK_BITS), flips):
+                flipped = chunk
+                for position in positions:
+                    flipped ^= 1 << position
+                yield flipped
+
+    def search(self, value, max_distance):
+        """Return [(distance, item)] within max_distance, nearest first"""
+        radius = max_distance // self.CHUNKS
+        matches = {}
+        for table, chunk in zip(self.tables, self.chunks(value)):
+            for probe in self.neighbours(chunk, radius):
+                for candidate, item in table.get(probe, ()):
+                    if item not in matches:
+                        distance = hamming_distance(value, candidate)
+                        if distance <= max_distance:
+                            matches[item] = distance
+        return sorted(((distance, item) for item, distance in matches.items()), key=lambda match: match[0])
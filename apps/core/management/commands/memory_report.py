@@ -0,0 +1,56 @@
+import json
+from django.core.management.base import BaseCommand
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.memory import get_aggregates
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Show profiled memory use of uploads per filter and image size bucket'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the raw aggregates as JSON'
+        )
+
+    def handle(self, *args, **options):
+        aggregates = get_aggregates(ImageProcessor.FILTER_VERSIONS)
+        if not aggregates:
+            self.stdout.write(
+                'No memory profiles recorded yet. Set MEMORY_PROFILE_SAMPLE_RATE or send '
+                'X-Memory-Profile with MEMORY_PROFILE_TOKEN.'
+            )
+            return
+
+        if options['json']:
+            rows = [
+                dict(entry, filter_type=filter_type, size_bucket=bucket)
+                for (filter_type, bucket), entry in aggregates.items()
+            ]
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        header = (
+            f"{'filter':<10}{'size':<9}{'count':>6}{'peak RSS':>10}{'avg grow':>10}"
+            f"{'max grow':>10}{'avg py':>9}{'max py':>9}  stages (max RSS delta / max py, MB)"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for (filter_type, bucket), entry in aggregates.items():
+            count = entry['count']
+            stages = ', '.join(
+                f"{name} {totals['rss_delta_max'] / MB:.1f}/{totals['traced_peak_max'] / MB:.1f}"
+                for name, totals in entry['stages'].items()
+            )
+            self.stdout.write(
+                f"{filter_type:<10}{bucket:<9}{count:>6}"
+                f"{entry['rss_peak_max'] / MB:>10.1f}"
+                f"{entry['rss_growth_total'] / count / MB:>10.1f}"
+                f"{entry['rss_growth_max'] / MB:>10.1f}"
+                f"{entry['traced_peak_total'] / count / MB:>9.1f}"
+                f"{entry['traced_peak_max'] / MB:>9.1f}  {stages}"
+            )
+        self.stdout.write('-' * len(header))
+        self.stdout.write('Sizes in MB. "py" is the tracemalloc peak, which excludes Pillow pixel buffers.')
@@ -0,0 +1,269 @@
+import json
+import logging
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_BASELINES = Path(settings.BASE_DIR) / 'config' / 'perf_baselines.json'
+
+# Latency above its baseline times this factor plus LATENCY_SLACK_MS is
+# flagged. Timings depend on the machine, so this report is advisory; query
+# budgets are enforced by the test suite (assertQueryBudget in apps/*/tests.py)
+DEFAULT_TOLERANCE = 2.0
+LATENCY_SLACK_MS = 10
+
+
+class Case:
+    """One request to measure
+
+    ``cold`` runs clear the cache before every request, so page and
+    metadata caching cannot hide queries; ``warm`` runs measure the
+    steady state. POST cases are only measured cold.
+    """
+
+    def __init__(self, name, method, path, data=None, login=False, warm=True):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.login = login
+        self.warm = warm and method == 'GET'
+
+
+class Command(BaseCommand):
+    help = 'Report per-view query counts and render latency against stored baselines (advisory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--images', type=int, default=500,
+            help='ProcessedImage rows to seed'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Requests per case; the median latency is reported'
+        )
+        parser.add_argument(
+            '--baselines', default=str(DEFAULT_BASELINES),
+            help='JSON file with latency baselines'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='Latency, as a multiple of the baseline, above which a view is flagged'
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Write the measured values as the new baselines instead of checking'
+        )
+
+    def handle(self, *args, **options):
+        from django.test.runner import DiscoverRunner
+        from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+        # Per-query and template debug logging would dominate the timings
+        for name in ('django.db.backends', 'django.template'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        media_root = tempfile.mkdtemp(prefix='perfcheck-media-')
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            # Local stand-in for S3 so only the application itself is measured
+            with override_settings(
+                DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+                MEDIA_ROOT=media_root,
+                DERIVATIVE_CACHE_DIR=f'{media_root}/derivatives',
+                ALLOWED_HOSTS=['testserver'],
+                DEBUG=False,
+                # Repeated uploads of the same image must be processed every time
+                NEAR_DUPLICATE_REUSE=False,
+            ):
+                cases = self.seed(options['images'])
+                results = [self.measure(case, options['repeat']) for case in cases]
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        if options['update']:
+            self.write_baselines(options['baselines'], results)
+        else:
+            self.compare(options['baselines'], results, options['tolerance'])
+
+    def seed(self, count):
+        """Create realistic rows and return the cases to measure"""
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import Client
+        from django.utils import timezone
+        from apps.images.management.commands.loadtest import make_synthetic_image
+        from apps.images.models import FilterDailyStats, ProcessedImage
+
+        self.stdout.write(f"Seeding {count} images...")
+        filters = [choice[0] for choice in ProcessedImage.FILTER_CHOICES]
+        now = timezone.now()
+        rows = [
+            ProcessedImage(
+                original_image=f'uploads/original/seed_{i}.jpg',
+                processed_image=f'uploads/processed/seed_{i}.jpg',
+                filter_type=filters[i % len(filters)],
+                file_size=500_000 + i,
+                width=1920,
+                height=1080,
+                image_format='JPEG',
+                color_mode='RGB',
+                content_hash=f'{i:064x}',
+            )
+            for i in range(count)
+        ]
+        ProcessedImage.objects.bulk_create(rows, batch_size=500)
+        # Spread rows over the last month for the per-day statistics
+        for day in range(30):
+            ProcessedImage.objects.filter(
+                content_hash__in=[row.content_hash for row in rows[day::30]]
+            ).update(created_at=now - timedelta(days=day))
+        FilterDailyStats.record_images(ProcessedImage.objects.all())
+
+        # One real upload so result, download and derivative views have files
+        upload_image = make_synthetic_image(1280, 960)
+        client = Client()
+        response = client.post('/images/upload/', {
+            'filter_type': 'sepia',
+            'original_image': SimpleUploadedFile('perfcheck.jpg', upload_image, 'image/jpeg'),
+        })
+        if response.status_code != 302:
+            raise CommandError(f"Seed upload failed with HTTP {response.status_code}")
+        image_id = response['Location'].rstrip('/').rsplit('/', 1)[-1]
+
+        user_model = get_user_model()
+        user_model.objects.create_superuser('perfcheck', 'perfcheck@example.com', 'perfcheck')
+        cache.clear()
+
+        def upload_data():
+            return {
+                'filter_type': 'gray',
+                'original_image': SimpleUploadedFile('perfcheck.jpg', upload_image, 'image/jpeg'),
+            }
+
+        def preview_data():
+            return {'image': SimpleUploadedFile('preview.jpg', make_synthetic_image(192, 144), 'image/jpeg')}
+
+        return [
+            Case('home', 'GET', '/'),
+            Case('about', 'GET', '/about/'),
+            Case('upload_form', 'GET', '/images/upload/'),
+            Case('upload', 'POST', '/images/upload/', data=upload_data),
+            Case('preview', 'POST', '/images/preview/', data=preview_data),
+            Case('result', 'GET', f'/images/result/{image_id}/'),
+            Case('gallery', 'GET', '/images/gallery/'),
+            Case('download', 'GET', f'/images/download/{image_id}/'),
+            Case('export', 'GET', f'/images/export/?ids={image_id}'),
+            Case('derivative', 'GET', f'/images/{image_id}/blur/320x0.webp'),
+            Case('storage_stats', 'GET', '/storage/stats/', login=True),
+        ]
+
+    def measure(self, case, repeat):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext
+
+        client = Client()
+        user = get_user_model().objects.get(username='perfcheck') if case.login else None
+
+        def run(clear_cache):
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                if clear_cache:
+                    cache.clear()
+                if user is not None:
+                    # Re-login every time: clearing the cache may drop the session
+                    client.force_login(user)
+                data = case.data() if case.data else None
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    if case.method == 'POST':
+                        response = client.post(case.path, data)
+                    else:
+                        response = client.get(case.path)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(f"{case.name}: HTTP {response.status_code} from {case.path}")
+                queries = max(queries, len(captured))
+            return queries, statistics.median(timings)
+
+        result = {'name': case.name}
+        result['queries'], result['ms'] = run(clear_cache=True)
+        if case.warm:
+            run(clear_cache=False)
+            result['warm_queries'], result['warm_ms'] = run(clear_cache=False)
+        return result
+
+    def write_baselines(self, path, results):
+        baselines = {}
+        for result in results:
+            entry = {'ms': round(result['ms'], 1)}
+            if 'warm_ms' in result:
+                entry['warm_ms'] = round(result['warm_ms'], 1)
+            baselines[result['name']] = entry
+        with open(path, 'w') as f:
+            json.dump(baselines, f, indent=2)
+            f.write('\n')
+        self.report(results, {})
+        self.stdout.write(self.style.SUCCESS(f"Wrote baselines for {len(baselines)} views to {path}"))
+
+    def compare(self, path, results, tolerance):
+        """Flag views slower than their baseline; never fails"""
+        try:
+            with open(path) as f:
+                baselines = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No baselines at {path}; run with --update first")
+
+        slow = []
+        for result in results:
+            baseline = baselines.get(result['name'], {})
+            for label, ms in (('cold', 'ms'), ('warm', 'warm_ms')):
+                if ms not in result or ms not in baseline:
+                    continue
+                limit = baseline[ms] * tolerance + LATENCY_SLACK_MS
+                if result[ms] > limit:
+                    slow.append(
+                        f"{result['name']}: {result[ms]:.1f} ms {label} "
+                        f"(baseline {baseline[ms]:.1f} ms, limit {limit:.1f} ms)"
+                    )
+
+        self.report(results, baselines)
+        if slow:
+            self.stdout.write(self.style.WARNING(
+                f"{len(slow)} timings above their baseline (advisory; baselines are machine-specific):"
+            ))
+            for line in slow:
+                self.stdout.write(f"  {line}")
+        else:
+            self.stdout.write(self.style.SUCCESS('All views within their latency baselines'))
+
+    def report(self, results, baselines):
+        header = f"{'view':<16}{'queries':>9}{'cold ms':>9}{'base':>8}{'warm q':>8}{'warm ms':>9}{'base':>8}"
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for result in results:
+            baseline = baselines.get(result['name'], {})
+            warm_queries = result.get('warm_queries', '-')
+            warm_ms = f"{result['warm_ms']:.1f}" if 'warm_ms' in result else '-'
+            self.stdout.write(
+                f"{result['name']:<16}{result['queries']:>9}{result['ms']:>9.1f}{baseline.get('ms', '-'):>8}"
+                f"{warm_queries:>8}{warm_ms:>9}{baseline.get('warm_ms', '-'):>8}"
+            )
+        self.stdout.write('-' * len(header))
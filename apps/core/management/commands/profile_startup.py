@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ('numpy', 'PIL', 'boto3', 'botocore')
+
+# Runs in a fresh interpreter started with -X importtime
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+if {warm!r}:
+    from apps.core.warmup import warm_up
+    warm_up()
+warm_done = time.perf_counter()
+from django.test import Client
+response = Client().get({path!r})
+first_request = time.perf_counter()
+print(json.dumps({{
+    'setup_ms': (setup_done - start) * 1000,
+    'warm_ms': (warm_done - setup_done) * 1000,
+    'request_ms': (first_request - warm_done) * 1000,
+    'status': response.status_code,
+    'heavy_loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (module, self_us, cumulative_us, depth)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Measure per-module import time and time to first request in a fresh worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='/',
+            help='URL requested as the first request (default: /)'
+        )
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Number of slowest imports to list'
+        )
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Run the gunicorn warm-up hook before the first request'
+        )
+
+    def handle(self, *args, **options):
+        script = CHILD_SCRIPT.format(
+            warm=options['warm'], path=options['path'], heavy=HEAVY_MODULES
+        )
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+        spawned = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall_ms = (time.perf_counter() - spawned) * 1000
+        if result.returncode != 0:
+            raise CommandError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = parse_importtime(result.stderr)
+
+        self.stdout.write(f"Slowest {options['top']} top-level imports (cumulative):")
+        top_level = sorted(
+            (row for row in imports if row[3] == 0),
+            key=lambda row: row[2], reverse=True
+        )
+        for name, self_us, cumulative_us, _ in top_level[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:9.1f} ms  {name}  (self {self_us / 1000:.1f} ms)")
+
+        total_import_ms = sum(row[2] for row in imports if row[3] == 0) / 1000
+        timings = [
+            ('Total import time', total_import_ms),
+            ('django.setup()', report['setup_ms']),
+        ]
+        if options['warm']:
+            timings.append(('Warm-up hook', report['warm_ms']))
+        timings += [
+            (f"First request to {options['path']} (HTTP {report['status']})", report['request_ms']),
+            ('Process spawn to response', wall_ms),
+        ]
+        self.stdout.write('')
+        for label, ms in timings:
+            self.stdout.write(f"{label + ':':<40}{ms:9.1f} ms")
+        heavy = ', '.join(report['heavy_loaded']) or 'none'
+        self.stdout.write(f"{'Heavy modules loaded:':<40}{heavy}")
@@ -0,0 +1,97 @@
+import json
+import logging
+import random
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from apps.common.utils.memory import MemoryProfile, record_aggregate, size_bucket
+from .routers import get_replicas, replica_reads
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Memory-Profile'
+
+# Set after a write so the client's next requests read from the primary
+PRIMARY_COOKIE = 'use_primary'
+
+
+class MemoryProfilingMiddleware:
+    """Opt-in per-request memory profiling
+
+    A request is profiled when it sends ``X-Memory-Profile`` with the value
+    of MEMORY_PROFILE_TOKEN, or when it is picked at
+    MEMORY_PROFILE_SAMPLE_RATE. Profiled requests are logged as one JSON
+    line each; requests tagged with a filter type are also aggregated per
+    filter and image size bucket (see the memory_report command). Views
+    mark stages on ``request.memory_profile``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def requested(self, request):
+        token = settings.MEMORY_PROFILE_TOKEN
+        return bool(token) and constant_time_compare(request.headers.get(PROFILE_HEADER, ''), token)
+
+    def sampled(self):
+        rate = settings.MEMORY_PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        profile = MemoryProfile()
+        request.memory_profile = profile
+        requested = self.requested(request)
+        if not (requested or self.sampled()) or not profile.start():
+            return self.get_response(request)
+
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+        finally:
+            record = profile.finish()
+            record.update(event='memory_profile', method=request.method, path=request.path, status=status)
+            logger.info(json.dumps(record, sort_keys=True))
+            if 'filter_type' in record:
+                bucket = size_bucket(record.get('width'), record.get('height'))
+                record_aggregate(record['filter_type'], bucket, record)
+
+        if requested:
+            response[PROFILE_HEADER] = f"rss_peak={record['rss_peak']}; traced_peak={record['traced_peak']}"
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Let read-only views read from replicas, with read-your-writes stickiness
+
+    GET and HEAD requests to views whose class sets ``replica_reads =
+    True`` read from a replica (see apps.core.routers.ReplicaRouter).
+    Every other request uses the primary. After an unsafe request, a
+    short-lived cookie keeps the client on the primary for
+    REPLICA_STICKY_SECONDS, so e.g. the result page shown right after an
+    upload never misses the new row because of replication lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and get_replicas():
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (
+            getattr(view_class, 'replica_reads', False)
+            and request.method in ('GET', 'HEAD')
+            and PRIMARY_COOKIE not in request.COOKIES
+        ):
+            replica_reads.set(True)
@@ -0,0 +1,43 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+
+PRIMARY = 'default'
+
+# Set per request by ReplicaRoutingMiddleware; reads only go to a replica
+# while this is True
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    """Send reads of opted-in requests to a read replica, everything else to the primary
+
+    Writes always go to the primary. Once a request has written, its
+    later reads also use the primary so it sees its own changes; across
+    requests, ReplicaRoutingMiddleware provides the same guarantee.
+    Replicas are configured with ``TEST: {'MIRROR': 'default'}`` and are
+    never migrated: they receive the primary's schema by replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and replica_reads.get():
+            return random.choice(replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        replica_reads.set(False)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
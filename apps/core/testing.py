@@ -0,0 +1,43 @@
+import logging
+from django.core.cache import cache
+
+
+class QueryBudgetMixin:
+    """Per-view query budgets for TestCase subclasses
+
+    ``assertQueryBudget`` requests a URL with an empty cache, so page and
+    metadata caching cannot hide queries, and optionally again once the
+    caches are warm. Going over a budget usually means a new N+1 query or
+    a lost cache; lower the budget when a change saves queries.
+    """
+
+    def assertQueryBudget(self, path, cold, warm=None, method='get', data=None, user=None):
+        """``data`` is a callable, so uploaded files are fresh for every request"""
+        # Debug logs of missing template variables print the context, which
+        # evaluates querysets that the page itself never runs
+        template_logger = logging.getLogger('django.template')
+        level = template_logger.level
+        template_logger.setLevel(logging.WARNING)
+        self.addCleanup(template_logger.setLevel, level)
+        runs = [('cold', cold)]
+        if warm is not None:
+            runs += [('warm-up', None), ('warm', warm)]
+        for label, budget in runs:
+            if label == 'cold':
+                cache.clear()
+            if user is not None:
+                # Logged in again every time: clearing the cache may drop the session
+                self.client.force_login(user)
+            args = (path, data()) if data else (path,)
+            if budget is None:
+                response = self.fetch(method, *args)
+            else:
+                with self.assertNumQueries(budget):
+                    response = self.fetch(method, *args)
+            self.assertLess(response.status_code, 400, f'{label} {method.upper()} {path}')
+
+    def fetch(self, method, *args):
+        response = getattr(self.client, method)(*args)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
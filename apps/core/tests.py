@@ -0,0 +1,103 @@
+from unittest import mock
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+from django.views import View
+from apps.images import views as image_views
+from apps.images.models import ProcessedImage
+from .middleware import PRIMARY_COOKIE
+from .routers import replica_reads
+from .testing import QueryBudgetMixin
+
+
+class PageQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Static pages run no queries"""
+
+    def test_home(self):
+        self.assertQueryBudget('/', cold=0, warm=0)
+
+    def test_about(self):
+        self.assertQueryBudget('/about/', cold=0, warm=0)
+
+
+class ReadDatabaseView(View):
+    """Responds with the database a read would use; ?write=1 writes first"""
+    replica_reads = True
+
+    def get(self, request):
+        if request.GET.get('write'):
+            router.db_for_write(ProcessedImage)
+        return HttpResponse(router.db_for_read(ProcessedImage))
+
+    def post(self, request):
+        return HttpResponse(router.db_for_read(ProcessedImage))
+
+
+class PrimaryOnlyView(View):
+    def get(self, request):
+        return HttpResponse(router.db_for_read(ProcessedImage))
+
+
+urlpatterns = [
+    path('read/', ReadDatabaseView.as_view()),
+    path('primary/', PrimaryOnlyView.as_view()),
+    path('images/export/', image_views.ImageExportView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF='apps.core.tests', DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    """Reads of opted-in views go to a replica unless the client has just written"""
+
+    def read_database(self, url='/read/'):
+        return self.client.get(url).content.decode()
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.read_database(), 'replica1')
+        # The choice does not leak out of the request
+        self.assertFalse(replica_reads.get())
+
+    def test_views_without_opt_in_read_from_primary(self):
+        self.assertEqual(self.read_database('/primary/'), 'default')
+
+    def test_unsafe_requests_read_from_primary(self):
+        self.assertEqual(self.client.post('/read/').content.decode(), 'default')
+
+    def test_write_moves_later_reads_to_primary(self):
+        self.assertEqual(self.read_database('/read/?write=1'), 'default')
+
+    def test_get_after_post_reads_from_primary(self):
+        response = self.client.post('/read/')
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]['max-age'], 10)
+        self.assertEqual(self.read_database(), 'default')
+
+    def test_sticky_cookie_reads_from_primary(self):
+        self.client.cookies[PRIMARY_COOKIE] = '1'
+        self.assertEqual(self.read_database(), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(self.read_database(), 'default')
+        self.assertNotIn(PRIMARY_COOKIE, self.client.post('/read/').cookies)
+
+    def test_export_stays_on_database_chosen_at_start(self):
+        ProcessedImage.objects.create(
+            original_image='uploads/original/a.jpg', processed_image='uploads/processed/a.jpg',
+            filter_type='gray',
+        )
+        # The replica shares the primary's connection, so it sees the row
+        connections['replica1'] = connections['default']
+        self.addCleanup(connections.__delitem__, 'replica1')
+        streamed_from = []
+
+        def stream_zip(images):
+            # Runs while the response is consumed, after the middleware
+            streamed_from.append((images.db, replica_reads.get()))
+            yield b''
+
+        with mock.patch.object(image_views, 'stream_zip', stream_zip):
+            response = self.client.get('/images/export/')
+            self.assertEqual(response.status_code, 200)
+            b''.join(response.streaming_content)
+        self.assertEqual(streamed_from, [('replica1', False)])
@@ -1,10 +1,11 @@
-from django.shortcuts import render
 from django.views.generic import TemplateView
+from apps.common.utils.cache import CachedPageMixin
 
 
-class HomeView(TemplateView):
+class HomeView(CachedPageMixin, TemplateView):
     """Home page view"""
     template_name = 'core/home.html'
+    cache_namespace = 'core'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -12,9 +13,10 @@ class HomeView(TemplateView):
         return context
 
 
-class AboutView(TemplateView):
+class AboutView(CachedPageMixin, TemplateView):
     """About page view"""
     template_name = 'core/about.html'
+    cache_namespace = 'core'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
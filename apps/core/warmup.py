@@ -0,0 +1,49 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Modules that are imported lazily on first use; warming loads them once
+# in the gunicorn master so forked workers share the already-loaded pages
+HEAVY_MODULES = ('numpy', 'PIL.Image', 'PIL.ImageFilter', 'PIL.ImageOps', 'boto3', 'botocore.session')
+
+WARM_TEMPLATES = (
+    'base.html',
+    'core/home.html',
+    'core/about.html',
+    'images/upload.html',
+    'images/result.html',
+    'images/gallery.html',
+)
+
+
+def warm_up():
+    """Load heavy dependencies, the URLconf and templates ahead of traffic
+
+    Safe to call before forking: it opens no database or network
+    connections. Returns the time spent in seconds.
+    """
+    import importlib
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    start = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning(f"Warm-up could not import {name}")
+
+    from PIL import Image
+    # Register every image plugin now rather than on the first upload
+    Image.init()
+
+    # Import every view module referenced by the URLconf
+    get_resolver().url_patterns
+
+    for template_name in WARM_TEMPLATES:
+        get_template(template_name)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Warm-up completed in {elapsed * 1000:.0f} ms")
+    return elapsed
@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import ColorLUT
+
+
+@admin.register(ColorLUT)
+class ColorLUTAdmin(admin.ModelAdmin):
+    """Upload and manage .cube colour grades"""
+    list_display = ['name', 'slug', 'size', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ['size']
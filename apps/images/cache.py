@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.http import Http404
+from apps.common.utils.cache import bump_cache_version, versioned_key
+from apps.common.utils.lut import parse_cube
+from .models import ProcessedImage
+
+GALLERY_NAMESPACE = 'gallery'
+
+# Parsed LUTs used by this process, keyed like the shared cache entries
+_parsed_luts = {}
+MAX_PARSED_LUTS = 32
+
+
+def image_namespace(image_id):
+    """Cache namespace for everything derived from a single image"""
+    return f'image:{image_id}'
+
+
+def get_image_metadata(image_id):
+    """Return a cached dict of the fields needed to serve an image
+
+    Raises Http404 when the image does not exist.
+    """
+    key = versioned_key(image_namespace(image_id), 'metadata')
+    metadata = cache.get(key)
+    if metadata is None:
+        row = ProcessedImage.objects.filter(id=image_id).values(
+            'filter_type', 'filter_version', 'original_image', 'processed_image',
+            's3_url', 'file_size', 'content_hash', 'width', 'height', 'image_format', 'color_mode',
+            'created_at', 'updated_at',
+        ).first()
+        if row is None:
+            raise Http404('No ProcessedImage matches the given query.')
+        metadata = row
+        cache.set(key, metadata, None)
+    return metadata
+
+
+def invalidate_image(image_id):
+    """Drop cached renderings for an image and the gallery listing"""
+    bump_cache_version(image_namespace(image_id))
+    bump_cache_version(GALLERY_NAMESPACE)
+
+
+def get_parsed_lut(color_lut):
+    """Return the CubeLUT for a ColorLUT, parsing its .cube file only once
+
+    Parsed tables are kept in this process and in the shared cache; the
+    key includes ``updated_at``, so replacing a LUT's file takes effect.
+    """
+    key = f'lut:{color_lut.pk}:{color_lut.updated_at.timestamp():.6f}'
+    parsed = _parsed_luts.get(key)
+    if parsed is None:
+        parsed = cache.get(key)
+        if parsed is None:
+            with color_lut.cube_file.open('rb') as f:
+                parsed = parse_cube(f.read().decode('utf-8', 'replace'))
+            cache.set(key, parsed, None)
+        if len(_parsed_luts) >= MAX_PARSED_LUTS:
+            _parsed_luts.clear()
+        _parsed_luts[key] = parsed
+    return parsed
@@ -0,0 +1,142 @@
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.image_metadata import LazyImage
+from apps.storage.utils.disk_cache import LRUDiskCache
+from .cache import get_image_metadata, get_parsed_lut
+from .models import ColorLUT, ProcessedImage
+
+# Filter name that only resizes and re-encodes the original
+ORIGINAL_FILTER = 'original'
+
+# Extension -> (Pillow format, content type, encoder options)
+DERIVATIVE_FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+}
+
+# How long a request waits for another worker rendering the same variant
+RENDER_WAIT = 30
+
+_disk_cache = None
+
+
+def get_derivative_cache():
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = LRUDiskCache(settings.DERIVATIVE_CACHE_DIR, settings.DERIVATIVE_CACHE_MAX_BYTES)
+    return _disk_cache
+
+
+def resolve_filter(filter_key):
+    """Return (filter_type, ColorLUT or None, version) for a URL filter name"""
+    if filter_key == ORIGINAL_FILTER:
+        return None, None, 0
+    if filter_key in ImageProcessor.FILTER_VERSIONS and filter_key != ProcessedImage.LUT_FILTER:
+        return filter_key, None, ImageProcessor.get_filter_version(filter_key)
+    prefix = f'{ProcessedImage.LUT_FILTER}:'
+    if filter_key.startswith(prefix):
+        lut = ColorLUT.objects.filter(slug=filter_key[len(prefix):], is_active=True).first()
+        if lut is not None:
+            version = (
+                f"{ImageProcessor.get_filter_version(ProcessedImage.LUT_FILTER)}"
+                f".{lut.pk}.{lut.updated_at.timestamp():.6f}"
+            )
+            return ProcessedImage.LUT_FILTER, lut, version
+    raise Http404(f'Unknown filter: {filter_key}')
+
+
+def check_size(width, height):
+    """Reject sizes outside DERIVATIVE_MAX_SIZE or DERIVATIVE_ALLOWED_SIZES
+
+    Only listed sizes are rendered, so the number of variants a client can
+    make the server render and cache per image is bounded.
+    """
+    max_size = settings.DERIVATIVE_MAX_SIZE
+    if width > max_size or height > max_size or not (width or height):
+        raise Http404('Unsupported size')
+    allowed = settings.DERIVATIVE_ALLOWED_SIZES
+    if '*' not in allowed and f'{width}x{height}' not in allowed:
+        raise Http404('Unsupported size')
+
+
+def render_derivative(original_name, filter_type, lut, width, height, extension):
+    """Resize, filter and encode a stored original, returning bytes
+
+    A dimension of 0 is derived from the aspect ratio. Images are only
+    ever scaled down, and the filter runs on the already-resized pixels.
+    """
+    from PIL import Image
+
+    storage = ProcessedImage._meta.get_field('original_image').storage
+    with storage.open(original_name, 'rb') as f:
+        lazy_img = LazyImage(f)
+        bounds = (
+            width or max(1, lazy_img.width * height // lazy_img.height),
+            height or max(1, lazy_img.height * width // lazy_img.width),
+        )
+        # Let the JPEG decoder downscale while decoding
+        image = lazy_img.decode(max_size=bounds)
+    image.thumbnail(bounds, Image.Resampling.LANCZOS)
+    if filter_type is not None:
+        image = ImageProcessor.process_image(image, filter_type, get_parsed_lut(lut) if lut else None)
+
+    output_format, _, options = DERIVATIVE_FORMATS[extension]
+    if output_format == 'JPEG':
+        return ImageProcessor.encode_jpeg(image, **options)
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    return ImageProcessor.encode_image(image, output_format, **options)
+
+
+def get_derivative(image_id, filter_key, width, height, extension):
+    """Return (path, content type) of a derivative, rendering it on first use
+
+    Derivatives live in a byte-bounded LRU disk cache keyed by the filter
+    version, so each variant is rendered once per version. Concurrent
+    requests for a missing variant wait for the worker rendering it rather
+    than rendering it again.
+    """
+    check_size(width, height)
+    filter_type, lut, version = resolve_filter(filter_key)
+    metadata = get_image_metadata(image_id)
+    if not metadata['original_image']:
+        raise Http404('Original image not found')
+    content_type = DERIVATIVE_FORMATS[extension][1]
+
+    disk_cache = get_derivative_cache()
+    key = f'{image_id}/{filter_key}/v{version}/{width}x{height}.{extension}'
+    path = disk_cache.get(key)
+    if path is not None:
+        return path, content_type
+
+    lock_key = f'derivative-lock:{key}'
+    token = uuid.uuid4().hex
+    owns_lock = cache.add(lock_key, token, RENDER_WAIT)
+    if not owns_lock:
+        deadline = time.monotonic() + RENDER_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            path = disk_cache.get(key)
+            if path is not None:
+                return path, content_type
+            if cache.get(lock_key) is None:
+                # The other render finished without a result or failed
+                break
+        # Take the lock over if it was released; a waiter that timed out
+        # renders without it and leaves the other worker's lock alone
+        owns_lock = cache.add(lock_key, token, RENDER_WAIT)
+    try:
+        content = render_derivative(
+            metadata['original_image'], filter_type, lut, width, height, extension
+        )
+        path = disk_cache.put(key, [content])
+    finally:
+        # The lock may have expired and been taken by another worker
+        if owns_lock and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    return path, content_type
@@ -1,10 +1,13 @@
 from django import forms
-from .models import ProcessedImage
+from .models import ColorLUT, ProcessedImage
 
 
 class ImageUploadForm(forms.ModelForm):
     """Form for image upload and processing"""
     
+    # Client-generated id under which processing progress is reported
+    progress_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+    
     class Meta:
         model = ProcessedImage
         fields = ['original_image', 'filter_type']
@@ -14,14 +17,75 @@ class ImageUploadForm(forms.ModelForm):
                 'accept': 'image/*',
                 'id': 'imageInput'
             }),
-            'filter_type': forms.RadioSelect(attrs={
-                'class': 'form-check-input'
-            }, choices=ProcessedImage.FILTER_CHOICES)
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['original_image'].required = True
-        self.fields['filter_type'].required = True
-        # Remove empty choice from filter_type field
-        self.fields['filter_type'].empty_label = None
+        # Built-in filters plus one "lut:<slug>" choice per active ColorLUT
+        self.luts = {lut.filter_key: lut for lut in ColorLUT.objects.filter(is_active=True)}
+        self.fields['filter_type'] = forms.ChoiceField(
+            choices=ProcessedImage.FILTER_CHOICES + [
+                (key, lut.name) for key, lut in self.luts.items()
+            ],
+            widget=forms.RadioSelect(attrs={'class': 'form-check-input'}),
+        )
+    
+    def clean_filter_type(self):
+        filter_type = self.cleaned_data['filter_type']
+        self.cleaned_data['lut'] = self.luts.get(filter_type)
+        if self.cleaned_data['lut'] is not None:
+            return ProcessedImage.LUT_FILTER
+        return filter_type
+
+
+class UUIDListField(forms.Field):
+    """UUIDs given as repeated parameters, comma-separated, or both"""
+    widget = forms.MultipleHiddenInput
+    
+    def to_python(self, value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = [value]
+        ids = []
+        uuid_field = forms.UUIDField()
+        for item in value:
+            for part in item.split(','):
+                if part.strip():
+                    ids.append(uuid_field.clean(part.strip()))
+        return ids
+
+
+class ImageExportForm(forms.Form):
+    """Selection of processed images to export, as ids and/or a query
+    
+    All given criteria must match; with none, every processed image is
+    exported.
+    """
+    
+    ids = UUIDListField(required=False)
+    filter_type = forms.ChoiceField(
+        choices=[('', 'All filters')] + ProcessedImage.TYPE_CHOICES, required=False
+    )
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('The start date must not be after the end date.')
+        return cleaned_data
+    
+    def get_queryset(self):
+        images = ProcessedImage.objects.exclude(processed_image='').exclude(processed_image__isnull=True)
+        if self.cleaned_data['ids']:
+            images = images.filter(id__in=self.cleaned_data['ids'])
+        if self.cleaned_data['filter_type']:
+            images = images.filter(filter_type=self.cleaned_data['filter_type'])
+        if self.cleaned_data['date_from']:
+            images = images.filter(created_at__date__gte=self.cleaned_data['date_from'])
+        if self.cleaned_data['date_to']:
+            images = images.filter(created_at__date__lte=self.cleaned_data['date_to'])
+        return images.order_by('created_at')
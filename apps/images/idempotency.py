@@ -0,0 +1,142 @@
+import hashlib
+import re
+import time
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Form field used by the upload page, which cannot set headers on a plain POST
+IDEMPOTENCY_FIELD = 'idempotency_key'
+KEY_RE = re.compile(r'[\w.:-]{8,128}')
+
+RUNNING = 'running'
+DONE = 'done'
+
+# Fields that differ between retries of the same request
+IGNORED_FIELDS = {'csrfmiddlewaretoken', IDEMPOTENCY_FIELD, 'progress_id'}
+
+# Response headers replayed to duplicates
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+POLL_INTERVAL = 0.25
+
+
+def request_fingerprint(request):
+    """Hash of the form fields and uploaded files of a request
+
+    A key reused with a different payload is a client bug, not a retry.
+    Files are identified by the sha256 the upload handler computed while
+    receiving them, falling back to name and size.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(request.POST):
+        if name not in IGNORED_FIELDS:
+            digest.update(f'{name}={request.POST.getlist(name)}\n'.encode())
+    for name in sorted(request.FILES):
+        for upload in request.FILES.getlist(name):
+            identity = getattr(upload, 'content_hash', '') or f'{upload.name}:{upload.size}'
+            digest.update(f'{name}@{identity}\n'.encode())
+    return digest.hexdigest()
+
+
+def serialize_response(response):
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'headers': {name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)},
+    }
+
+
+def replay_response(stored):
+    response = HttpResponse(stored['content'], status=stored['status'])
+    for name, value in stored['headers'].items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotentPostMixin:
+    """Run a POST at most once per Idempotency-Key
+
+    The first request with a key claims it with ``cache.add`` and runs the
+    view; its response is stored for IDEMPOTENCY_TTL seconds and replayed
+    to every later request with the same key. A duplicate arriving while
+    the first one is still running waits for it (up to IDEMPOTENCY_WAIT
+    seconds) instead of repeating the work. Requests without a key are
+    handled normally. A view sets ``idempotent_store = False`` for results
+    that must not be replayed, e.g. failures worth retrying.
+    """
+    idempotency_scope = None
+    idempotent_replay_message = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'POST':
+            return super().dispatch(request, *args, **kwargs)
+        key = request.headers.get(IDEMPOTENCY_HEADER) or request.POST.get(IDEMPOTENCY_FIELD, '')
+        if not key:
+            return super().dispatch(request, *args, **kwargs)
+        if not KEY_RE.fullmatch(key):
+            return JsonResponse({'error': 'Malformed idempotency key.'}, status=400)
+
+        cache_key = f'idempotency:{self.idempotency_scope or request.path}:{key}'
+        fingerprint = request_fingerprint(request)
+        if cache.add(cache_key, {'state': RUNNING, 'fingerprint': fingerprint}, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return self.run_once(cache_key, fingerprint, request, *args, **kwargs)
+
+        record = self.wait_for(cache_key, fingerprint)
+        if record is None:
+            # The first run failed or expired; this request takes over
+            if cache.add(cache_key, {'state': RUNNING, 'fingerprint': fingerprint}, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                return self.run_once(cache_key, fingerprint, request, *args, **kwargs)
+            record = self.wait_for(cache_key, fingerprint)
+        if record is not None and record['fingerprint'] != fingerprint:
+            return JsonResponse(
+                {'error': 'This idempotency key was already used for a different request.'}, status=422
+            )
+        if record is None or record['state'] != DONE:
+            response = JsonResponse(
+                {'error': 'A request with this idempotency key is still being processed.'}, status=409
+            )
+            response['Retry-After'] = '5'
+            return response
+        if self.idempotent_replay_message and 300 <= record['response']['status'] < 400:
+            messages.info(request, self.idempotent_replay_message)
+        return replay_response(record['response'])
+
+    def run_once(self, cache_key, fingerprint, request, *args, **kwargs):
+        self.idempotent_store = True
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                # Template responses are stored with their rendered content
+                response = response.render()
+            store = response.status_code < 500 and not response.streaming and self.idempotent_store
+            if store:
+                cache.set(cache_key, {
+                    'state': DONE,
+                    'fingerprint': fingerprint,
+                    'response': serialize_response(response),
+                }, settings.IDEMPOTENCY_TTL)
+        except BaseException:
+            # Never leave the key claimed, or every retry would get a 409
+            # until the claim expires
+            cache.delete(cache_key)
+            raise
+        if not store:
+            # Let a retry run again
+            cache.delete(cache_key)
+        return response
+
+    def wait_for(self, cache_key, fingerprint):
+        """Poll until the running request finishes; None if it vanished"""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+        record = cache.get(cache_key)
+        while (
+            record is not None and record['state'] == RUNNING
+            and record['fingerprint'] == fingerprint and time.monotonic() < deadline
+        ):
+            time.sleep(POLL_INTERVAL)
+            record = cache.get(cache_key)
+        return record
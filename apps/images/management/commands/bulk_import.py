@@ -0,0 +1,272 @@
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from apps.common.utils.cache import bump_cache_version
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.image_metadata import LazyImage
+from apps.common.utils.perceptual_hash import image_dhash, to_signed
+from apps.images.cache import GALLERY_NAMESPACE
+from apps.images.models import FilterDailyStats, ProcessedImage
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def process_file(path, filter_types):
+    """Decode one source file and render it with every requested filter
+
+    Runs in a worker process, so it only takes and returns picklable data.
+    """
+    with open(path, 'rb') as f:
+        content_hash = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            content_hash.update(chunk)
+        f.seek(0)
+        lazy_img = LazyImage(f)
+        perceptual_hash = to_signed(image_dhash(lazy_img))
+        outputs = {}
+        for filter_type in filter_types:
+            encoding = {}
+            content, extension = ImageProcessor.render(lazy_img, filter_type, encoding=encoding)
+            outputs[filter_type] = (content, extension, encoding)
+    return {
+        'path': path,
+        'metadata': lazy_img.metadata,
+        'file_size': os.path.getsize(path),
+        'content_hash': content_hash.hexdigest(),
+        'perceptual_hash': perceptual_hash,
+        'outputs': outputs,
+    }
+
+
+def upload_path(storage, name, path):
+    """Save a local file to storage and return the stored name"""
+    with open(path, 'rb') as f:
+        return storage.save(name, File(f))
+
+
+class Command(BaseCommand):
+    help = 'Process a directory or manifest of images in parallel and import the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Directory of images, or a manifest file listing one image path per line'
+        )
+        parser.add_argument(
+            '--filter', dest='filters', action='append', required=True,
+            choices=[choice[0] for choice in ProcessedImage.FILTER_CHOICES],
+            help='Filter to apply; repeat to create one image per filter'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of processes used for decoding and filtering'
+        )
+        parser.add_argument(
+            '--upload-workers', type=int, default=8,
+            help='Number of concurrent storage uploads'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Source files per bulk_create batch and checkpoint'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording the imported path and filter pairs (default: alongside the source)'
+        )
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        filters = list(dict.fromkeys(options['filters']))
+        paths = self.collect_paths(source)
+
+        checkpoint = options['checkpoint'] or self.default_checkpoint(source)
+        done = self.load_checkpoint(checkpoint)
+        pending = []
+        for path in paths:
+            imported = done.get(path, set())
+            todo = [filter_type for filter_type in filters if filter_type not in imported]
+            if todo:
+                pending.append((path, todo))
+        self.stdout.write(
+            f"{len(paths)} images found, {len(paths) - len(pending)} already imported, "
+            f"{len(pending)} to process with filters: {', '.join(filters)}"
+        )
+        if not pending:
+            return
+
+        self.field_original = ProcessedImage._meta.get_field('original_image')
+        self.field_processed = ProcessedImage._meta.get_field('processed_image')
+        self.imported = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+        # Worker processes must not inherit open database connections
+        connections.close_all()
+
+        max_in_flight = max(1, options['workers']) * 2
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool, \
+                ThreadPoolExecutor(max_workers=options['upload_workers']) as uploader, \
+                open(checkpoint, 'a') as checkpoint_file:
+            path_iter = iter(pending)
+            in_flight = set()
+            batch = []
+            while True:
+                # Keep a bounded number of decodes queued so results
+                # never pile up in memory faster than they are stored
+                while len(in_flight) < max_in_flight:
+                    item = next(path_iter, None)
+                    if item is None:
+                        break
+                    in_flight.add(pool.submit(process_file, *item))
+                if not in_flight:
+                    break
+
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.failed += 1
+                        self.stderr.write(f"Failed to process image: {e}")
+                        continue
+                    batch.append(self.start_uploads(result, uploader))
+
+                if len(batch) >= options['batch_size']:
+                    self.flush(batch, checkpoint_file)
+                    batch = []
+
+            if batch:
+                self.flush(batch, checkpoint_file)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} images ({self.failed} failed) in {elapsed:.1f}s "
+            f"({self.imported / elapsed if elapsed else 0:.1f} images/s)"
+        ))
+
+    def collect_paths(self, source):
+        """Return absolute image paths from a directory tree or manifest"""
+        if os.path.isdir(source):
+            paths = []
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        paths.append(os.path.join(root, name))
+            return paths
+
+        if os.path.isfile(source):
+            base_dir = os.path.dirname(source)
+            with open(source) as f:
+                return [
+                    os.path.normpath(os.path.join(base_dir, line.strip()))
+                    for line in f
+                    if line.strip() and not line.startswith('#')
+                ]
+
+        raise CommandError(f"Source not found: {source}")
+
+    def default_checkpoint(self, source):
+        if os.path.isdir(source):
+            return os.path.join(source, '.bulk_import_checkpoint')
+        return f'{source}.checkpoint'
+
+    def load_checkpoint(self, checkpoint):
+        """Return {path: filters already imported} from "<filter>\t<path>" lines"""
+        done = {}
+        if not os.path.exists(checkpoint):
+            return done
+        with open(checkpoint) as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if not line.strip():
+                    continue
+                filter_type, tab, path = line.partition('\t')
+                if not tab:
+                    raise CommandError(f"Malformed checkpoint line in {checkpoint}: {line!r}")
+                done.setdefault(path, set()).add(filter_type)
+        return done
+
+    def start_uploads(self, result, uploader):
+        """Build rows for one source file and queue its storage writes"""
+        metadata = result['metadata']
+        rows = []
+        uploads = []
+        original_future = None
+        for filter_type, (content, extension, encoding) in result['outputs'].items():
+            instance = ProcessedImage(
+                filter_type=filter_type,
+                filter_version=ImageProcessor.get_filter_version(filter_type),
+                width=metadata['width'],
+                height=metadata['height'],
+                file_size=result['file_size'],
+                content_hash=result['content_hash'],
+                perceptual_hash=result['perceptual_hash'],
+                image_format=metadata['format'],
+                color_mode=metadata['mode'],
+                frame_count=metadata['n_frames'],
+                orientation=metadata['orientation'],
+                **encoding,
+            )
+            if original_future is None:
+                # Every filter output shares one stored copy of the original
+                name = self.field_original.generate_filename(
+                    instance, os.path.basename(result['path'])
+                )
+                original_future = uploader.submit(
+                    upload_path, self.field_original.storage, name, result['path']
+                )
+            name = self.field_processed.generate_filename(
+                instance, f'processed_{instance.id}_{filter_type}.{extension}'
+            )
+            uploads.append(uploader.submit(
+                self.field_processed.storage.save, name, ContentFile(content)
+            ))
+            rows.append(instance)
+        return {
+            'path': result['path'],
+            'rows': rows,
+            'original': original_future,
+            'uploads': uploads,
+        }
+
+    def flush(self, batch, checkpoint_file):
+        """Wait for a batch of uploads, insert its rows and checkpoint it"""
+        rows = []
+        paths = []
+        entries = []
+        for item in batch:
+            try:
+                original_name = item['original'].result()
+                processed_names = [future.result() for future in item['uploads']]
+            except Exception as e:
+                self.failed += 1
+                self.stderr.write(f"Failed to store {item['path']}: {e}")
+                continue
+            for instance, processed_name in zip(item['rows'], processed_names):
+                instance.original_image.name = original_name
+                instance.processed_image.name = processed_name
+                rows.append(instance)
+                entries.append(f"{instance.filter_type}\t{item['path']}\n")
+            paths.append(item['path'])
+
+        if rows:
+            ProcessedImage.objects.bulk_create(rows)
+            # bulk_create skips post_save, so do its bookkeeping here
+            FilterDailyStats.record_images(rows)
+            bump_cache_version(GALLERY_NAMESPACE)
+        if entries:
+            checkpoint_file.write(''.join(entries))
+            checkpoint_file.flush()
+
+        self.imported += len(paths)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{self.imported} images imported in {elapsed:.1f}s "
+            f"({self.imported / elapsed if elapsed else 0:.1f} images/s)"
+        )
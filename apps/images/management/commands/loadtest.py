@@ -0,0 +1,312 @@
+import http.cookiejar
+import io
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from apps.images.models import ProcessedImage
+
+CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+RESULT_ID_RE = re.compile(r'/images/result/([0-9a-f-]{36})/')
+
+
+def make_synthetic_image(width, height, quality=90):
+    """Return JPEG bytes of a noisy gradient, which compresses like a photo"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(width * height)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = x
+    pixels[..., 1] = y
+    pixels[..., 2] = (x + y) / 2
+    pixels += rng.normal(0, 20, size=pixels.shape)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """Talks to a running server over HTTP with its own cookie jar"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect()
+        )
+
+    def request(self, method, path, body=None, headers=None):
+        request = urllib.request.Request(
+            self.base_url + path, data=body, headers=headers or {}, method=method
+        )
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read(), response.headers.get('Location', '')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers.get('Location', '')
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post_multipart(self, path, fields, files):
+        boundary = uuid.uuid4().hex
+        body = io.BytesIO()
+        for name, value in fields.items():
+            body.write(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, (filename, content, content_type) in files.items():
+            body.write(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'.encode()
+            )
+            body.write(content)
+            body.write(b'\r\n')
+        body.write(f'--{boundary}--\r\n'.encode())
+        csrf_token = next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+        return self.request('POST', path, body.getvalue(), {
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+            'X-CSRFToken': csrf_token,
+            'Referer': self.base_url + path,
+        })
+
+
+class InProcessTransport:
+    """Drives the views in this process through Django's test client"""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client(enforce_csrf_checks=True)
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.content, response.get('Location', '')
+
+    def post_multipart(self, path, fields, files):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        data = dict(fields)
+        for name, (filename, content, content_type) in files.items():
+            data[name] = SimpleUploadedFile(filename, content, content_type)
+        response = self.client.post(path, data)
+        return response.status_code, response.content, response.get('Location', '')
+
+
+class VirtualUser:
+    """Repeatedly uploads, browses the gallery and downloads results"""
+
+    def __init__(self, transport, images, filters, mix, recorder):
+        self.transport = transport
+        self.images = images
+        self.filters = filters
+        self.mix = mix
+        self.recorder = recorder
+        self.image_ids = []
+        self.csrf_token = None
+
+    def timed(self, name, call, *args):
+        start = time.perf_counter()
+        try:
+            status, content, location = call(*args)
+        except Exception as e:
+            self.recorder.record(name, time.perf_counter() - start, error=type(e).__name__)
+            return None
+        ok = status < 400 and (name != 'upload' or RESULT_ID_RE.search(location))
+        self.recorder.record(
+            name, time.perf_counter() - start, error=None if ok else f'HTTP {status}'
+        )
+        return status, content, location
+
+    def upload(self):
+        if self.csrf_token is None:
+            result = self.timed('upload_form', self.transport.get, '/images/upload/')
+            match = result and CSRF_INPUT_RE.search(result[1])
+            if not match:
+                return
+            self.csrf_token = match.group(1).decode()
+
+        size, content = random.choice(self.images)
+        result = self.timed(
+            'upload', self.transport.post_multipart, '/images/upload/',
+            {'csrfmiddlewaretoken': self.csrf_token, 'filter_type': random.choice(self.filters)},
+            {'original_image': (f'loadtest_{size}.jpg', content, 'image/jpeg')},
+        )
+        match = result and RESULT_ID_RE.search(result[2])
+        if match:
+            self.image_ids.append(match.group(1))
+
+    def gallery(self):
+        self.timed('gallery', self.transport.get, '/images/gallery/')
+
+    def download(self):
+        if not self.image_ids:
+            return self.upload()
+        image_id = random.choice(self.image_ids)
+        self.timed('download', self.transport.get, f'/images/download/{image_id}/')
+
+    def step(self):
+        action = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        getattr(self, action)()
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, seconds, error=None):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            if error:
+                self.errors[name][error] += 1
+
+
+class Command(BaseCommand):
+    help = 'Generate concurrent upload, gallery and download load and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server; without it the views run in-process '
+                 'against a throwaway test database and temporary local storage'
+        )
+        parser.add_argument('--users', type=int, default=4, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=30, help='Test length in seconds')
+        parser.add_argument(
+            '--sizes', default='640x480,1920x1080',
+            help='Comma-separated synthetic image sizes, e.g. 640x480,4000x3000'
+        )
+        parser.add_argument(
+            '--filters', default=','.join(choice[0] for choice in ProcessedImage.FILTER_CHOICES),
+            help='Comma-separated filters to pick from at random'
+        )
+        parser.add_argument(
+            '--mix', default='upload=1,gallery=2,download=2',
+            help='Relative weights of upload, gallery and download requests'
+        )
+        parser.add_argument('--timeout', type=float, default=120, help='HTTP timeout in seconds')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [tuple(int(v) for v in size.split('x')) for size in options['sizes'].split(',')]
+            mix = {
+                name: float(weight)
+                for name, weight in (item.split('=') for item in options['mix'].split(','))
+            }
+        except ValueError:
+            raise CommandError('Invalid --sizes or --mix value')
+        unknown = set(mix) - {'upload', 'gallery', 'download'}
+        if unknown:
+            raise CommandError(f"Unknown --mix actions: {', '.join(sorted(unknown))}")
+        filters = options['filters'].split(',')
+
+        self.stdout.write(f"Generating synthetic images: {options['sizes']}")
+        images = [(f'{w}x{h}', make_synthetic_image(w, h)) for w, h in sizes]
+
+        if options['url']:
+            make_transport = lambda: HttpTransport(options['url'], options['timeout'])
+            recorder, elapsed = self.run_load(make_transport, images, filters, mix, options)
+        else:
+            recorder, elapsed = self.run_in_process(images, filters, mix, options)
+
+        self.report(recorder, elapsed)
+
+    def run_in_process(self, images, filters, mix, options):
+        from django.test.runner import DiscoverRunner
+        from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+        from django.db import connections
+
+        media_root = tempfile.mkdtemp(prefix='loadtest-media-')
+        for connection in connections.all():
+            if connection.vendor == 'sqlite':
+                # The default in-memory test database serialises every
+                # writer on a table lock; a file database handles threads
+                connection.settings_dict['TEST']['NAME'] = f'{media_root}/loadtest.sqlite3'
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            # Local stand-in for S3 so only the application itself is measured
+            with override_settings(
+                DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+                MEDIA_ROOT=media_root,
+                ALLOWED_HOSTS=['testserver'],
+            ):
+                return self.run_load(InProcessTransport, images, filters, mix, options)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def run_load(self, make_transport, images, filters, mix, options):
+        recorder = Recorder()
+        deadline = time.monotonic() + options['duration']
+
+        def user_loop():
+            from django.db import connection
+            user = VirtualUser(make_transport(), images, filters, mix, recorder)
+            try:
+                while time.monotonic() < deadline:
+                    user.step()
+            finally:
+                connection.close()
+
+        self.stdout.write(f"Running {options['users']} users for {options['duration']:.0f}s...")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['users']) as pool:
+            for future in [pool.submit(user_loop) for _ in range(options['users'])]:
+                future.result()
+        return recorder, time.monotonic() - start
+
+    def report(self, recorder, elapsed):
+        header = f"{'endpoint':<12}{'count':>7}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total = 0
+        total_errors = 0
+        for name in sorted(recorder.latencies):
+            values = sorted(recorder.latencies[name])
+            errors = sum(recorder.errors[name].values())
+            total += len(values)
+            total_errors += errors
+            self.stdout.write(
+                f"{name:<12}{len(values):>7}{len(values) / elapsed:>8.1f}"
+                f"{percentile(values, 0.50) * 1000:>9.0f}{percentile(values, 0.95) * 1000:>9.0f}"
+                f"{percentile(values, 0.99) * 1000:>9.0f}{errors:>8}"
+            )
+        self.stdout.write('-' * len(header))
+        error_rate = 100 * total_errors / total if total else 0
+        self.stdout.write(
+            f"{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, "
+            f"{error_rate:.2f}% errors"
+        )
+        for name, errors in sorted(recorder.errors.items()):
+            for error, count in sorted(errors.items()):
+                self.stdout.write(f"  {name}: {count} x {error}")
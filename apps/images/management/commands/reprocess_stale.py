@@ -0,0 +1,138 @@
+import os
+import time
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.image_metadata import LazyImage
+from apps.images.cache import get_parsed_lut, invalidate_image
+from apps.images.models import ProcessedImage
+
+
+def stale_images():
+    """Rows whose processed output predates the current filter version"""
+    stale = Q()
+    for filter_type, version in ImageProcessor.FILTER_VERSIONS.items():
+        stale |= Q(filter_type=filter_type, filter_version__lt=version)
+    return ProcessedImage.objects.filter(stale).select_related('lut')
+
+
+class Command(BaseCommand):
+    help = 'Regenerate processed images produced by an outdated filter version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Rows fetched per query'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=2.0,
+            help='Maximum images reprocessed per second (0 for unlimited)'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=0,
+            help='Stop after this many images (0 for no limit)'
+        )
+        parser.add_argument(
+            '--nice', type=int, default=10,
+            help='Increment to this process\'s scheduling niceness'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows are stale'
+        )
+
+    def handle(self, *args, **options):
+        queryset = stale_images()
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} stale images")
+            return
+
+        if options['nice'] and hasattr(os, 'nice'):
+            os.nice(options['nice'])
+
+        interval = 1.0 / options['rate'] if options['rate'] > 0 else 0
+        reprocessed = 0
+        failed = 0
+        last_pk = None
+        started = time.monotonic()
+
+        # Walk stale rows in primary key order. Each regenerated row stops
+        # matching the stale query, so an interrupted run simply resumes
+        # with whatever is still stale; the cursor only skips rows that
+        # failed earlier in this run.
+        done = False
+        while not done:
+            batch_queryset = queryset.order_by('pk')
+            if last_pk is not None:
+                batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+            batch = list(batch_queryset[:options['batch_size']])
+            if not batch:
+                break
+
+            for processed_image in batch:
+                last_pk = processed_image.pk
+                tick = time.monotonic()
+                try:
+                    if self.reprocess(processed_image):
+                        reprocessed += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Failed to reprocess {processed_image.pk}: {e}")
+
+                if options['limit'] and reprocessed >= options['limit']:
+                    done = True
+                    break
+                # Rate limit so reprocessing never competes with live traffic
+                remaining = interval - (time.monotonic() - tick)
+                if remaining > 0:
+                    time.sleep(remaining)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{reprocessed} reprocessed, {failed} failed in {elapsed:.1f}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reprocessed {reprocessed} images ({failed} failed)"
+        ))
+
+    def reprocess(self, processed_image):
+        """Regenerate one row's output from its stored original
+
+        Returns False if the row was changed by someone else meanwhile.
+        """
+        filter_type = processed_image.filter_type
+        version = ImageProcessor.get_filter_version(filter_type)
+
+        with processed_image.original_image.open('rb') as f:
+            lut = get_parsed_lut(processed_image.lut) if processed_image.lut_id else None
+            # Cleared unless the new output is an adaptively encoded JPEG
+            encoding = {'jpeg_quality': None, 'jpeg_ssim': None}
+            content, extension = ImageProcessor.render(LazyImage(f), filter_type, lut, encoding=encoding)
+
+        field = ProcessedImage._meta.get_field('processed_image')
+        name = field.generate_filename(
+            processed_image, f'processed_{processed_image.id}_{filter_type}_v{version}.{extension}'
+        )
+        name = field.storage.save(name, ContentFile(content))
+
+        # Conditional update instead of a row lock: live requests are never
+        # blocked, and a concurrent change simply wins over this one
+        updated = ProcessedImage.objects.filter(
+            pk=processed_image.pk,
+            filter_version=processed_image.filter_version,
+        ).update(
+            processed_image=name,
+            filter_version=version,
+            updated_at=timezone.now(),
+            **encoding,
+        )
+        if not updated:
+            field.storage.delete(name)
+            return False
+
+        old_name = processed_image.processed_image.name
+        if old_name and old_name != name:
+            field.storage.delete(old_name)
+        invalidate_image(processed_image.pk)
+        return True
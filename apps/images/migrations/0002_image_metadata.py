@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='color_mode',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='processedimage',
+            name='image_format',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='processedimage',
+            name='orientation',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
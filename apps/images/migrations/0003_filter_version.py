@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0002_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='filter_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='processedimage',
+            index=models.Index(fields=['filter_type', 'filter_version'], name='images_filter_version_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:17
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_filter_daily_stats(apps, schema_editor):
+    """Seed the summary table from existing images in a single aggregate"""
+    ProcessedImage = apps.get_model('images', 'ProcessedImage')
+    FilterDailyStats = apps.get_model('images', 'FilterDailyStats')
+    rows = (
+        ProcessedImage.objects
+        .annotate(day=TruncDate('created_at'))
+        .values('filter_type', 'day')
+        .order_by()
+        .annotate(
+            image_count=Count('id'),
+            total_bytes=Coalesce(Sum('file_size'), Value(0)),
+            total_pixels=Coalesce(
+                Sum(F('width') * F('height'), output_field=models.BigIntegerField()),
+                Value(0),
+            ),
+        )
+    )
+    FilterDailyStats.objects.bulk_create([FilterDailyStats(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0003_filter_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilterDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_type', models.CharField(choices=[('gray', 'Grayscale'), ('sepia', 'Sepia'), ('poster', 'Poster'), ('blur', 'Blur'), ('edge', 'Edge Detection'), ('solar', 'Solar')], max_length=20)),
+                ('day', models.DateField()),
+                ('image_count', models.IntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('total_pixels', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Filter Daily Stats',
+                'verbose_name_plural': 'Filter Daily Stats',
+                'ordering': ['-day', 'filter_type'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='processedimage',
+            index=models.Index(fields=['created_at'], name='images_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processedimage',
+            index=models.Index(fields=['filter_type', 'created_at'], name='images_filter_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='filterdailystats',
+            unique_together={('filter_type', 'day')},
+        ),
+        migrations.RunPython(backfill_filter_daily_stats, migrations.RunPython.noop),
+    ]
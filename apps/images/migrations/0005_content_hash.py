@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0004_indexes_and_filter_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
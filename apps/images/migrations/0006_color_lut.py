@@ -0,0 +1,48 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:28
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0005_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColorLUT',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(unique=True)),
+                ('cube_file', models.FileField(upload_to='luts/', validators=[django.core.validators.FileExtensionValidator(['cube'])])),
+                ('size', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Color LUT',
+                'verbose_name_plural': 'Color LUTs',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='filterdailystats',
+            name='filter_type',
+            field=models.CharField(choices=[('gray', 'Grayscale'), ('sepia', 'Sepia'), ('poster', 'Poster'), ('blur', 'Blur'), ('edge', 'Edge Detection'), ('solar', 'Solar'), ('lut', 'Custom LUT')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='processedimage',
+            name='filter_type',
+            field=models.CharField(choices=[('gray', 'Grayscale'), ('sepia', 'Sepia'), ('poster', 'Poster'), ('blur', 'Blur'), ('edge', 'Edge Detection'), ('solar', 'Solar'), ('lut', 'Custom LUT')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='processedimage',
+            name='lut',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='images', to='images.colorlut'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0006_color_lut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
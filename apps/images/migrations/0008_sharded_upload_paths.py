@@ -0,0 +1,24 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:42
+
+import apps.images.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0007_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processedimage',
+            name='original_image',
+            field=models.ImageField(upload_to=apps.images.models.original_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='processedimage',
+            name='processed_image',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.images.models.processed_upload_to),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.25 on 2026-10-18 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0008_sharded_upload_paths'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='jpeg_quality',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='processedimage',
+            name='jpeg_ssim',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
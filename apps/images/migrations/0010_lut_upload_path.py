@@ -0,0 +1,20 @@
+# Generated by Django 4.2.25 on 2026-10-18 23:22
+
+import apps.images.models
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0009_processedimage_jpeg_params'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='colorlut',
+            name='cube_file',
+            field=models.FileField(upload_to=apps.images.models.lut_upload_to, validators=[django.core.validators.FileExtensionValidator(['cube'])]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0010_lut_upload_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='frame_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,67 @@
+import os
 import uuid
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.common.utils.lut import parse_cube
 from apps.core.models import BaseModel
+from apps.storage.utils.sharding import sharded_name
+
+
+# Files are stored under hash-derived prefixes of the image id. Names are
+# stored in full, so files saved before sharding keep resolving as-is.
+# Every name is unique (it carries the image id or a random token), so
+# storages can write without first checking whether the name is taken.
+def original_upload_to(instance, filename):
+    return sharded_name('uploads/original', instance.id, f'{instance.id}_{os.path.basename(filename)}')
+
+
+def processed_upload_to(instance, filename):
+    return sharded_name('uploads/processed', instance.id, filename)
+
+
+def lut_upload_to(instance, filename):
+    return f'luts/{uuid.uuid4().hex}_{os.path.basename(filename)}'
+
+
+class ColorLUT(BaseModel):
+    """Uploaded .cube 3D colour lookup table, selectable like a filter"""
+    
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(unique=True)
+    cube_file = models.FileField(
+        upload_to=lut_upload_to, validators=[FileExtensionValidator(['cube'])]
+    )
+    size = models.PositiveSmallIntegerField(default=0, editable=False)
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Color LUT'
+        verbose_name_plural = 'Color LUTs'
+    
+    def __str__(self):
+        return self.name
+    
+    @property
+    def filter_key(self):
+        """Value used for this LUT in filter selections"""
+        return f'{ProcessedImage.LUT_FILTER}:{self.slug}'
+    
+    def clean(self):
+        if not self.cube_file:
+            return
+        self.cube_file.open('rb')
+        try:
+            text = self.cube_file.read().decode('utf-8', 'replace')
+        finally:
+            self.cube_file.seek(0)
+        try:
+            self.size = parse_cube(text).size
+        except ValueError as e:
+            raise ValidationError({'cube_file': str(e)})
 
 
 class ProcessedImage(BaseModel):
@@ -15,22 +76,76 @@ class ProcessedImage(BaseModel):
         ('solar', 'Solar'),
     ]
     
+    # Colour grades from an uploaded ColorLUT, which is referenced by ``lut``
+    LUT_FILTER = 'lut'
+    TYPE_CHOICES = FILTER_CHOICES + [(LUT_FILTER, 'Custom LUT')]
+    
+    # Fields read by stats_contribution()
+    STATS_FIELDS = frozenset({'filter_type', 'created_at', 'file_size', 'width', 'height'})
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    original_image = models.ImageField(upload_to='uploads/original/')
-    processed_image = models.ImageField(upload_to='uploads/processed/', blank=True, null=True)
-    filter_type = models.CharField(max_length=20, choices=FILTER_CHOICES)
+    original_image = models.ImageField(upload_to=original_upload_to)
+    processed_image = models.ImageField(upload_to=processed_upload_to, blank=True, null=True)
+    filter_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    lut = models.ForeignKey(
+        'ColorLUT', on_delete=models.PROTECT, null=True, blank=True, related_name='images'
+    )
+    filter_version = models.PositiveIntegerField(default=1)
     s3_url = models.URLField(blank=True, null=True)
     file_size = models.PositiveIntegerField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # 64-bit dHash of the original, stored signed; see apps.images.near_duplicates
+    perceptual_hash = models.BigIntegerField(null=True, blank=True, db_index=True)
     width = models.PositiveIntegerField(null=True, blank=True)
     height = models.PositiveIntegerField(null=True, blank=True)
+    image_format = models.CharField(max_length=10, blank=True)
+    color_mode = models.CharField(max_length=10, blank=True)
+    frame_count = models.PositiveIntegerField(null=True, blank=True)
+    orientation = models.PositiveSmallIntegerField(default=1)
+    # Encoder settings chosen for a JPEG result; null for animations and
+    # fixed-quality encodes
+    jpeg_quality = models.PositiveSmallIntegerField(null=True, blank=True)
+    jpeg_ssim = models.FloatField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['filter_type', 'filter_version'], name='images_filter_version_idx'),
+            models.Index(fields=['created_at'], name='images_created_at_idx'),
+            models.Index(fields=['filter_type', 'created_at'], name='images_filter_created_idx'),
+        ]
         verbose_name = 'Processed Image'
         verbose_name_plural = 'Processed Images'
     
     def __str__(self):
-        return f"{self.get_filter_type_display()} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+        return f"{self.filter_name} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributes to FilterDailyStats so a later
+        # save or delete can apply the difference without another query.
+        # Reading a deferred field would reload it through from_db, so rows
+        # loaded with only()/defer() get no snapshot
+        if cls.STATS_FIELDS.isdisjoint(instance.get_deferred_fields()):
+            instance._stats_snapshot = instance.stats_contribution()
+        else:
+            instance._stats_snapshot = None
+        return instance
+    
+    def stats_contribution(self):
+        """Return (filter_type, day, bytes, pixels) counted for this row"""
+        if self.created_at is None:
+            return None
+        pixels = (self.width or 0) * (self.height or 0)
+        return (self.filter_type, timezone.localdate(self.created_at), self.file_size or 0, pixels)
+    
+    @property
+    def filter_name(self):
+        """Display name of the applied filter, naming the LUT for colour grades"""
+        if self.filter_type == self.LUT_FILTER and self.lut_id:
+            return self.lut.name
+        return self.get_filter_type_display()
     
     @property
     def file_size_mb(self):
@@ -38,3 +153,60 @@ class ProcessedImage(BaseModel):
         if self.file_size:
             return round(self.file_size / (1024 * 1024), 2)
         return None
+
+
+class FilterDailyStats(models.Model):
+    """Per-filter, per-day totals of ProcessedImage rows
+
+    Maintained incrementally from ProcessedImage save/delete signals so
+    reports never have to scan the image table.
+    """
+    filter_type = models.CharField(max_length=20, choices=ProcessedImage.TYPE_CHOICES)
+    day = models.DateField()
+    image_count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    total_pixels = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day', 'filter_type']
+        unique_together = [('filter_type', 'day')]
+        verbose_name = 'Filter Daily Stats'
+        verbose_name_plural = 'Filter Daily Stats'
+    
+    def __str__(self):
+        return f"{self.get_filter_type_display()} - {self.day}: {self.image_count}"
+    
+    @classmethod
+    def record(cls, filter_type, day, count, total_bytes, total_pixels):
+        """Add (or with negative values, subtract) totals for one filter and day"""
+        changes = {
+            'image_count': F('image_count') + count,
+            'total_bytes': F('total_bytes') + total_bytes,
+            'total_pixels': F('total_pixels') + total_pixels,
+        }
+        if cls.objects.filter(filter_type=filter_type, day=day).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    filter_type=filter_type,
+                    day=day,
+                    image_count=count,
+                    total_bytes=total_bytes,
+                    total_pixels=total_pixels,
+                )
+        except IntegrityError:
+            # Another request created the row first
+            cls.objects.filter(filter_type=filter_type, day=day).update(**changes)
+    
+    @classmethod
+    def record_images(cls, images):
+        """Count newly inserted images, e.g. after a bulk_create"""
+        totals = {}
+        for image in images:
+            filter_type, day, size, pixels = image.stats_contribution()
+            count, total_bytes, total_pixels = totals.get((filter_type, day), (0, 0, 0))
+            totals[(filter_type, day)] = (count + 1, total_bytes + size, total_pixels + pixels)
+            image._stats_snapshot = image.stats_contribution()
+        for (filter_type, day), values in totals.items():
+            cls.record(filter_type, day, *values)
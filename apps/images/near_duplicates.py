@@ -0,0 +1,101 @@
+import threading
+from django.conf import settings
+from apps.common.utils.cache import bump_cache_version, get_cache_version
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.perceptual_hash import MultiIndexHash, is_informative, to_unsigned
+from .models import ProcessedImage
+
+# Bumped when indexed rows go away; new rows are picked up incrementally
+INDEX_NAMESPACE = 'phash-index'
+
+
+class NearDuplicateIndex:
+    """Per-process multi-index hash tables of perceptual hashes, one per filter (and LUT)
+
+    The first lookup loads every hash; later lookups only fetch rows
+    created since the previous sync. A change of the INDEX_NAMESPACE
+    cache version (e.g. after a delete) forces a full rebuild.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.seen = set()
+        self.version = None
+        self.synced_at = None
+
+    def sync(self):
+        version = get_cache_version(INDEX_NAMESPACE)
+        rows = ProcessedImage.objects.filter(perceptual_hash__isnull=False)
+        if version != self.version:
+            self.tables = {}
+            self.seen = set()
+            self.synced_at = None
+        if self.synced_at is not None:
+            # >= because rows may share a timestamp; seen ids are skipped
+            rows = rows.filter(created_at__gte=self.synced_at)
+        for image_id, filter_type, lut_id, value, created_at in rows.values_list(
+            'id', 'filter_type', 'lut_id', 'perceptual_hash', 'created_at'
+        ).order_by('created_at').iterator():
+            if image_id in self.seen:
+                continue
+            self.seen.add(image_id)
+            self.tables.setdefault((filter_type, lut_id), MultiIndexHash()).add(to_unsigned(value), image_id)
+            self.synced_at = created_at
+        self.version = version
+
+    def find(self, value, filter_type, lut_id=None, max_distance=None, **source):
+        """Return the closest existing result for a hash, or None
+
+        Candidates are re-checked against the database so deleted rows,
+        rows without output and outputs of an older filter version are
+        never reused. ``source`` holds further field values a candidate
+        must have, e.g. its width and height.
+        """
+        if max_distance is None:
+            max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE
+        with self.lock:
+            self.sync()
+            table = self.tables.get((filter_type, lut_id))
+            matches = table.search(value, max_distance) if table else []
+        if not matches:
+            return None
+        candidates = {
+            image.id: image
+            for image in ProcessedImage.objects.filter(
+                id__in=[image_id for _, image_id in matches[:20]],
+                filter_version=ImageProcessor.get_filter_version(filter_type),
+                **source,
+            ).exclude(processed_image='').exclude(processed_image__isnull=True)
+        }
+        for _, image_id in matches:
+            if image_id in candidates:
+                return candidates[image_id]
+        return None
+
+
+near_duplicate_index = NearDuplicateIndex()
+
+
+def find_near_duplicate(value, filter_type, metadata, lut=None):
+    """Existing ProcessedImage whose original looks like ``value``, or None
+
+    Only originals with the same size, format and frame count as the
+    upload (its LazyImage ``metadata``) match, so a resized copy is not
+    given a result at the old resolution and a still image never gets an
+    animated result, or the reverse.
+    """
+    if not settings.NEAR_DUPLICATE_REUSE or not is_informative(value):
+        return None
+    return near_duplicate_index.find(
+        value, filter_type, lut.pk if lut else None,
+        width=metadata['width'],
+        height=metadata['height'],
+        image_format=metadata['format'],
+        frame_count=metadata['n_frames'],
+    )
+
+
+def invalidate_index():
+    bump_cache_version(INDEX_NAMESPACE)
+
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.image_metadata import LazyImage
+from .cache import get_parsed_lut
+from .models import ColorLUT, ProcessedImage
+
+
+def source_key(token):
+    return f'preview:source:{token}'
+
+
+def preview_key(token, filter_key, lut=None):
+    if lut is not None:
+        version = f"{ImageProcessor.get_filter_version(ProcessedImage.LUT_FILTER)}:{lut.pk}:{lut.updated_at.timestamp():.6f}"
+    else:
+        version = ImageProcessor.get_filter_version(filter_key)
+    return f'preview:{token}:{filter_key}:v{version}'
+
+
+def preview_filters():
+    """Return (key, filter_type, ColorLUT or None) for every selectable filter"""
+    filters = [(filter_type, filter_type, None) for filter_type, _ in ProcessedImage.FILTER_CHOICES]
+    for lut in ColorLUT.objects.filter(is_active=True):
+        filters.append((lut.filter_key, ProcessedImage.LUT_FILTER, lut))
+    return filters
+
+
+def store_preview_source(fileobj):
+    """Decode an upload to a small thumbnail and cache it under a token
+
+    The token is the SHA-256 of the uploaded bytes, so re-posting the same
+    file reuses both the cached thumbnail and any previews rendered from it.
+    JPEG sources are downscaled by the decoder itself via ``draft()``;
+    other formats are decoded at full size, so they are rejected above
+    PREVIEW_MAX_SOURCE_PIXELS.
+    """
+    size = settings.PREVIEW_SIZE
+    hasher = hashlib.sha256()
+    for chunk in fileobj.chunks():
+        hasher.update(chunk)
+    token = hasher.hexdigest()
+
+    if cache.get(source_key(token)) is None:
+        fileobj.seek(0)
+        lazy_img = LazyImage(fileobj)
+        pixels = lazy_img.width * lazy_img.height
+        if lazy_img.metadata['format'] != 'JPEG':
+            max_pixels = settings.PREVIEW_MAX_SOURCE_PIXELS
+        else:
+            max_pixels = settings.MAX_UPLOAD_PIXELS
+        if pixels > max_pixels:
+            raise ValueError('Image is too large to preview.')
+        image = lazy_img.decode(max_size=(size, size))
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        cache.set(
+            source_key(token),
+            (image.mode, image.size, image.tobytes()),
+            settings.PREVIEW_CACHE_TIMEOUT
+        )
+    return token
+
+
+def load_preview_source(token):
+    """Return the cached thumbnail for a token, or None once it has expired"""
+    from PIL import Image
+
+    source = cache.get(source_key(token))
+    if source is None:
+        return None
+    mode, size, data = source
+    return Image.frombytes(mode, size, data)
+
+
+def render_previews(token):
+    """Return {filter: data URI} for every filter, or None if the token expired
+
+    Keys are the upload form's filter values ("lut:<slug>" for colour
+    grades). Each preview is cached per token, filter and filter version,
+    so only filters not rendered before for this image are computed.
+    """
+    filters = preview_filters()
+    keys = {filter_key: preview_key(token, filter_key, lut) for filter_key, _, lut in filters}
+    cached = cache.get_many(keys.values())
+    previews = {
+        filter_key: cached[key] for filter_key, key in keys.items() if key in cached
+    }
+    missing = [entry for entry in filters if entry[0] not in previews]
+    if not missing:
+        return previews
+
+    image = load_preview_source(token)
+    if image is None:
+        return None
+
+    rendered = {}
+    for filter_key, filter_type, lut in missing:
+        content = ImageProcessor.encode_jpeg(
+            ImageProcessor.process_image(image, filter_type, get_parsed_lut(lut) if lut else None),
+            quality=70
+        )
+        previews[filter_key] = rendered[keys[filter_key]] = (
+            'data:image/jpeg;base64,' + base64.b64encode(content).decode('ascii')
+        )
+    cache.set_many(rendered, settings.PREVIEW_CACHE_TIMEOUT)
+    # Keep the thumbnail alive while the user is still comparing filters
+    cache.touch(source_key(token), settings.PREVIEW_CACHE_TIMEOUT)
+    return previews
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+from django.core.cache import cache
+
+# Stages reported while an upload is processed, in order
+STAGES = ('decoded', 'filtering', 'encoding', 'stored')
+FINAL_STAGES = ('stored', 'failed')
+
+PROGRESS_TIMEOUT = 600
+# How often an open stream checks the cache, and for how long it may stay open
+POLL_INTERVAL = 0.25
+STREAM_TIMEOUT = 300
+HEARTBEAT_INTERVAL = 15
+
+
+def progress_key(progress_id):
+    return f'progress:{progress_id}'
+
+
+def report_progress(progress_id, stage, **data):
+    """Append a stage event for a progress id
+
+    Each progress id has a single writer (the request processing the
+    upload), so a read-modify-write of the event list is safe.
+    """
+    if not progress_id:
+        return
+    key = progress_key(progress_id)
+    events = cache.get(key) or []
+    events.append(dict(data, stage=stage, time=time.time()))
+    cache.set(key, events, PROGRESS_TIMEOUT)
+
+
+def get_progress_events(progress_id):
+    return cache.get(progress_key(progress_id)) or []
+
+
+def format_event(index, event):
+    """Render one event in text/event-stream format"""
+    return f"id: {index}\nevent: progress\ndata: {json.dumps(event)}\n\n".encode()
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) + 1
+    except (TypeError, ValueError):
+        return 0
+
+
+async def progress_stream(scope, receive, send, progress_id):
+    """ASGI app streaming a progress id's events as server-sent events
+
+    The stream polls the cache from the event loop, so an open connection
+    costs no worker thread. It closes after a final stage, on client
+    disconnect or after STREAM_TIMEOUT seconds; EventSource clients
+    resume from Last-Event-ID when they reconnect.
+    """
+    headers = dict(scope.get('headers', []))
+    sent = parse_last_event_id(headers.get(b'last-event-id', b'').decode('latin-1'))
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    started = last_write = time.monotonic()
+    try:
+        while not disconnected.is_set() and time.monotonic() - started < STREAM_TIMEOUT:
+            events = await cache.aget(progress_key(progress_id)) or []
+            chunk = b''.join(format_event(index, events[index]) for index in range(sent, len(events)))
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                last_write = time.monotonic()
+                sent = len(events)
+                if events[-1]['stage'] in FINAL_STAGES:
+                    break
+            elif time.monotonic() - last_write > HEARTBEAT_INTERVAL:
+                # Comment line keeps proxies from closing an idle stream
+                await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                last_write = time.monotonic()
+            try:
+                await asyncio.wait_for(disconnected.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .cache import invalidate_image
+from .near_duplicates import invalidate_index
+from .models import FilterDailyStats, ProcessedImage
+
+
+@receiver(post_save, sender=ProcessedImage)
+def processed_image_saved(sender, instance, created, **kwargs):
+    """Invalidate cached pages and update daily stats on create or update"""
+    invalidate_image(instance.id)
+    
+    old = None if created else getattr(instance, '_stats_snapshot', None)
+    if old is None and not created:
+        # An update to a row loaded without a snapshot (or never loaded)
+        return
+    new = instance.stats_contribution()
+    if old == new:
+        return
+    if old is not None:
+        FilterDailyStats.record(old[0], old[1], -1, -old[2], -old[3])
+    FilterDailyStats.record(new[0], new[1], 1, new[2], new[3])
+    instance._stats_snapshot = new
+
+
+@receiver(pre_delete, sender=ProcessedImage)
+def processed_image_deleting(sender, instance, **kwargs):
+    """Snapshot rows loaded with deferred stats fields while they still exist"""
+    if getattr(instance, '_stats_snapshot', None) is None:
+        instance._stats_snapshot = instance.stats_contribution()
+
+
+@receiver(post_delete, sender=ProcessedImage)
+def processed_image_deleted(sender, instance, **kwargs):
+    """Invalidate cached pages and update daily stats when an image is removed"""
+    invalidate_image(instance.id)
+    # A deferred field can no longer be loaded once the row is gone
+    if 'perceptual_hash' in instance.get_deferred_fields() or instance.perceptual_hash is not None:
+        invalidate_index()
+    
+    old = getattr(instance, '_stats_snapshot', None)
+    if old is not None:
+        FilterDailyStats.record(old[0], old[1], -1, -old[2], -old[3])
@@ -0,0 +1,368 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.views import View
+from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.image_metadata import LazyImage
+from apps.common.utils.perceptual_hash import to_signed
+from apps.core.testing import QueryBudgetMixin
+from . import derivatives
+from .idempotency import RUNNING, IdempotentPostMixin, request_fingerprint
+from .management.commands.loadtest import make_synthetic_image
+from .models import FilterDailyStats, ProcessedImage
+from .near_duplicates import find_near_duplicate, invalidate_index
+
+IN_MEMORY_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+FILESYSTEM_STORAGES = dict(
+    IN_MEMORY_STORAGES, default={'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+)
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class DeferredFieldsStatsTests(TestCase):
+    """Rows loaded with only()/defer() must not recurse through from_db"""
+
+    def setUp(self):
+        image = ProcessedImage(filter_type='gray', width=40, height=20, file_size=1000)
+        image.original_image.save('a.jpg', ContentFile(b'jpeg'), save=False)
+        image.save()
+        self.image_id = image.id
+
+    def stats(self):
+        return FilterDailyStats.objects.values_list('image_count', 'total_bytes', 'total_pixels').get()
+
+    def test_only_loads_without_snapshot(self):
+        image = ProcessedImage.objects.only('id').get(pk=self.image_id)
+        self.assertIsNone(image._stats_snapshot)
+        self.assertEqual(image.file_size, 1000)
+
+    def test_defer_and_partial_refresh(self):
+        image = ProcessedImage.objects.defer('width').get(pk=self.image_id)
+        self.assertEqual(image.width, 40)
+        image = ProcessedImage.objects.get(pk=self.image_id)
+        image.refresh_from_db(fields=['file_size'])
+        self.assertIsNotNone(image._stats_snapshot)
+
+    def test_save_without_snapshot_leaves_stats(self):
+        image = ProcessedImage.objects.only('id', 'filter_type').get(pk=self.image_id)
+        image.save()
+        self.assertEqual(self.stats(), (1, 1000, 800))
+
+    def test_delete_without_snapshot_updates_stats(self):
+        ProcessedImage.objects.only('id').get(pk=self.image_id).delete()
+        self.assertEqual(self.stats(), (0, 0, 0))
+
+
+class DerivativeUrlTests(TestCase):
+    """Only canonical UUIDs reach the derivative view"""
+
+    def test_malformed_ids_are_not_found(self):
+        for image_id in ('-' * 36, 'ABCDEF01-2345-6789-ABCD-EF0123456789', '0123456789abcdef0123456789abcdef----'):
+            response = self.client.get(f'/images/{image_id}/blur/320x0.jpg')
+            self.assertEqual(response.status_code, 404, image_id)
+
+    def test_unknown_image_is_not_found(self):
+        response = self.client.get('/images/01234567-89ab-cdef-0123-456789abcdef/blur/320x0.jpg')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(JPEG_ADAPTIVE=False)
+@override_settings(STORAGES=IN_MEMORY_STORAGES, NEAR_DUPLICATE_REUSE=True)
+class NearDuplicateTests(TestCase):
+    """Only a recompressed copy of the same size, format and frame count reuses a result"""
+
+    HASH = 0x0F0F_3C3C_5A5A_F0F0
+    SOURCE = {'width': 640, 'height': 480, 'format': 'JPEG', 'n_frames': 1}
+
+    def setUp(self):
+        image = ProcessedImage(
+            filter_type='gray',
+            filter_version=ImageProcessor.get_filter_version('gray'),
+            perceptual_hash=to_signed(self.HASH),
+            width=640, height=480, image_format='JPEG', frame_count=1,
+        )
+        image.original_image.save('a.jpg', ContentFile(b'jpeg'), save=False)
+        image.processed_image.save('a.jpg', ContentFile(b'jpeg'), save=False)
+        image.save()
+        self.image = image
+        invalidate_index()
+
+    def find(self, value=HASH, filter_type='gray', **source):
+        return find_near_duplicate(value, filter_type, dict(self.SOURCE, **source))
+
+    def test_recompressed_copy_matches(self):
+        self.assertEqual(self.find(self.HASH ^ 0b101), self.image)
+
+    def test_other_filter_does_not_match(self):
+        self.assertIsNone(self.find(filter_type='sepia'))
+
+    def test_resized_copy_does_not_match(self):
+        self.assertIsNone(self.find(width=320, height=240))
+
+    def test_other_format_does_not_match(self):
+        self.assertIsNone(self.find(format='PNG'))
+
+    def test_animation_does_not_match_still(self):
+        self.assertIsNone(self.find(n_frames=12))
+
+    def test_rows_without_frame_count_do_not_match(self):
+        ProcessedImage.objects.filter(pk=self.image.pk).update(frame_count=None)
+        self.assertIsNone(self.find())
+
+    @override_settings(NEAR_DUPLICATE_REUSE=False)
+    def test_disabled(self):
+        self.assertIsNone(self.find())
+
+
+class RenderFramesTests(SimpleTestCase):
+    """Only real animations are rendered as animations"""
+
+    def encode(self, output_format, **options):
+        from PIL import Image
+
+        frames = [Image.new('RGB', (32, 24), (shade, 0, 0)) for shade in (0, 120, 240)]
+        buffer = BytesIO()
+        frames[0].save(buffer, output_format, save_all=True, append_images=frames[1:], **options)
+        buffer.seek(0)
+        return LazyImage(buffer)
+
+    def render(self, source):
+        from PIL import Image
+
+        content, extension = ImageProcessor.render(source, 'gray')
+        return Image.open(BytesIO(content)), extension
+
+    def test_mpo_renders_first_frame_as_jpeg(self):
+        image, extension = self.render(self.encode('MPO'))
+        self.assertEqual(extension, 'jpg')
+        self.assertEqual(getattr(image, 'n_frames', 1), 1)
+
+    def test_gif_without_loop_plays_once(self):
+        image, extension = self.render(self.encode('GIF', duration=50))
+        self.assertEqual((extension, image.n_frames), ('gif', 3))
+        self.assertNotIn('loop', image.info)
+
+    def test_gif_keeps_loop_count(self):
+        image, _ = self.render(self.encode('GIF', duration=50, loop=2))
+        self.assertEqual(image.info['loop'], 2)
+
+
+@override_settings(NEAR_DUPLICATE_REUSE=False)
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Query counts of the image views must not grow with the number of rows"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Files go to a temporary directory. InMemoryStorage does not fit,
+        # because uploads store their two files from parallel threads
+        media_root = tempfile.mkdtemp(prefix='media-')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root, STORAGES=FILESYSTEM_STORAGES)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        filters = [choice[0] for choice in ProcessedImage.FILTER_CHOICES]
+        ProcessedImage.objects.bulk_create([
+            ProcessedImage(
+                original_image=f'uploads/original/seed_{i}.jpg',
+                processed_image=f'uploads/processed/seed_{i}.jpg',
+                filter_type=filters[i % len(filters)],
+                file_size=1000 + i, width=640, height=480, content_hash=f'{i:064x}',
+            )
+            for i in range(40)
+        ])
+        FilterDailyStats.record_images(ProcessedImage.objects.all())
+        cls.jpeg = make_synthetic_image(320, 240)
+        response = Client().post('/images/upload/', cls.upload_data())
+        cls.image_id = response['Location'].rstrip('/').rsplit('/', 1)[-1]
+
+    @classmethod
+    def upload_data(cls):
+        return {
+            'filter_type': 'sepia',
+            'original_image': SimpleUploadedFile('photo.jpg', cls.jpeg, 'image/jpeg'),
+        }
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp(prefix='derivatives-')
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings_override = override_settings(DERIVATIVE_CACHE_DIR=cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # The disk cache is created once per process from the setting
+        derivatives._disk_cache = None
+        self.addCleanup(setattr, derivatives, '_disk_cache', None)
+
+    def test_upload_form(self):
+        self.assertQueryBudget('/images/upload/', cold=1, warm=1)
+
+    def test_upload(self):
+        self.assertQueryBudget('/images/upload/', cold=3, method='post', data=self.upload_data)
+
+    def test_preview(self):
+        def preview_data():
+            return {'image': SimpleUploadedFile('preview.jpg', make_synthetic_image(192, 144), 'image/jpeg')}
+        self.assertQueryBudget('/images/preview/', cold=1, method='post', data=preview_data)
+
+    def test_result(self):
+        self.assertQueryBudget(f'/images/result/{self.image_id}/', cold=1, warm=0)
+
+    def test_gallery(self):
+        self.assertQueryBudget('/images/gallery/', cold=1, warm=0)
+
+    def test_download(self):
+        self.assertQueryBudget(f'/images/download/{self.image_id}/', cold=1, warm=0)
+
+    def test_download_sets_no_cookies(self):
+        # nginx only caches responses without Set-Cookie
+        image = ProcessedImage.objects.get(pk=self.image_id)
+        for query in ('', f'?v={image.filter_version}'):
+            response = self.client.get(f'/images/download/{self.image_id}/{query}')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.cookies, query)
+
+    def test_export(self):
+        self.assertQueryBudget(f'/images/export/?ids={self.image_id}', cold=2, warm=2)
+
+    def test_derivative(self):
+        self.assertQueryBudget(f'/images/{self.image_id}/blur/320x0.webp', cold=1, warm=0)
+
+
+class BulkImportTests(TestCase):
+    """Checkpoints let an interrupted or partly failed import resume"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp(prefix='media-')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root, STORAGES=FILESYSTEM_STORAGES)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp(prefix='import-')
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        for name, size in (('a.jpg', (64, 48)), ('b.jpg', (48, 64))):
+            self.write(name, make_synthetic_image(*size))
+        self.write('broken.jpg', b'not an image')
+        self.checkpoint = os.path.join(self.source, '.bulk_import_checkpoint')
+
+    def write(self, name, content):
+        with open(os.path.join(self.source, name), 'wb') as f:
+            f.write(content)
+
+    def run_import(self, *filters):
+        stderr = StringIO()
+        args = [f'--filter={filter_type}' for filter_type in filters]
+        call_command('bulk_import', self.source, *args, workers=1, stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def imported(self):
+        """(source file name, filter) of every row; stored names have a unique prefix"""
+        return sorted(
+            (os.path.basename(name).split('_', 1)[1], filter_type)
+            for name, filter_type in ProcessedImage.objects.values_list('original_image', 'filter_type')
+        )
+
+    def test_partial_failure_checkpoints_only_stored_files(self):
+        errors = self.run_import('gray')
+        self.assertIn('Failed to process image', errors)
+        self.assertEqual(self.imported(), [('a.jpg', 'gray'), ('b.jpg', 'gray')])
+        with open(self.checkpoint) as f:
+            self.assertEqual(sorted(line.split('\t')[0] for line in f), ['gray', 'gray'])
+
+        # Once fixed, only the failed file is imported again
+        self.write('broken.jpg', make_synthetic_image(32, 32))
+        self.assertEqual(self.run_import('gray'), '')
+        self.assertEqual(
+            self.imported(), [('a.jpg', 'gray'), ('b.jpg', 'gray'), ('broken.jpg', 'gray')]
+        )
+
+    def test_resume_runs_only_new_filters(self):
+        os.remove(os.path.join(self.source, 'broken.jpg'))
+        self.run_import('gray')
+        self.run_import('gray', 'sepia')
+        self.assertEqual(self.imported(), [
+            ('a.jpg', 'gray'), ('a.jpg', 'sepia'), ('b.jpg', 'gray'), ('b.jpg', 'sepia'),
+        ])
+
+    def test_malformed_checkpoint_is_rejected(self):
+        with open(self.checkpoint, 'w') as f:
+            f.write(os.path.join(self.source, 'a.jpg') + '\n')
+        with self.assertRaises(CommandError):
+            self.run_import('gray')
+        self.assertFalse(ProcessedImage.objects.exists())
+
+
+class CountingView(IdempotentPostMixin, View):
+    idempotency_scope = 'test'
+    calls = []
+
+    def post(self, request):
+        self.calls.append(request.POST.get('filter_type'))
+        if request.POST.get('fail'):
+            raise RuntimeError('processing failed')
+        return HttpResponseRedirect(f'/images/result/{len(self.calls)}/')
+
+
+@override_settings(IDEMPOTENCY_WAIT=0)
+class IdempotencyTests(SimpleTestCase):
+    """POSTs with the same Idempotency-Key run once"""
+
+    def setUp(self):
+        cache.clear()
+        CountingView.calls = []
+        self.view = CountingView.as_view()
+
+    def post(self, key='retry-key-1', **data):
+        request = RequestFactory().post('/images/upload/', data or {'filter_type': 'gray'}, HTTP_IDEMPOTENCY_KEY=key)
+        return self.view(request)
+
+    def test_retry_replays_first_response(self):
+        first = self.post()
+        second = self.post()
+        self.assertEqual(CountingView.calls, ['gray'])
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_different_payload_is_rejected(self):
+        self.post(filter_type='gray')
+        response = self.post(filter_type='sepia')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(CountingView.calls, ['gray'])
+
+    def test_duplicate_of_running_request_gets_conflict(self):
+        request = RequestFactory().post('/images/upload/', {'filter_type': 'gray'})
+        cache.set('idempotency:test:retry-key-1', {
+            'state': RUNNING, 'fingerprint': request_fingerprint(request),
+        })
+        response = self.post()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(CountingView.calls, [])
+
+    def test_failed_run_releases_key(self):
+        with self.assertRaises(RuntimeError):
+            self.post(filter_type='gray', fail='1')
+        self.assertIsNone(cache.get('idempotency:test:retry-key-1'))
+        self.assertEqual(self.post(filter_type='gray', fail='').status_code, 302)
+
+    def test_view_returning_none_releases_key(self):
+        view = type('NoneView', (IdempotentPostMixin, View), {'post': lambda self, request: None}).as_view()
+        with self.assertRaises(AttributeError):
+            view(RequestFactory().post('/images/process/', HTTP_IDEMPOTENCY_KEY='retry-key-2'))
+        self.assertIsNone(cache.get('idempotency:/images/process/:retry-key-2'))
@@ -0,0 +1,91 @@
+import hashlib
+from io import BytesIO
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+# Leading bytes of the image formats we accept
+MAGIC_NUMBERS = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+)
+
+
+def sniff_image_format(head):
+    """Return the image format identified by a file's first bytes, or None"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    for magic, image_format in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return image_format
+    return None
+
+
+class InspectingUploadHandler(TemporaryFileUploadHandler):
+    """Spool uploads to disk while hashing and inspecting them
+
+    As chunks arrive the handler updates a SHA-256 of the content, checks
+    the magic bytes and parses the image header to learn its dimensions.
+    Files that are not images, or whose dimensions exceed
+    MAX_UPLOAD_PIXELS, abort the upload before the rest of the body is
+    read. The resulting TemporaryUploadedFile carries a ``content_hash``
+    attribute.
+    """
+
+    # Give up on the early header parse after this many bytes; the form's
+    # own validation still inspects the complete file
+    HEADER_PARSE_LIMIT = 256 * 1024
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.head = b''
+        self.sniffed_format = None
+        self.sniffed_size = None
+
+    def reject(self, reason):
+        self.request.upload_rejection = reason
+        self.file.close()
+        raise StopUpload(connection_reset=True)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+
+        if self.sniffed_size is None and len(self.head) < self.HEADER_PARSE_LIMIT:
+            self.head += raw_data
+            if self.sniffed_format is None and len(self.head) >= 12:
+                self.sniffed_format = sniff_image_format(self.head)
+                if self.sniffed_format is None:
+                    self.reject('The uploaded file is not a supported image.')
+            if self.sniffed_format is not None:
+                self.parse_header()
+            if self.sniffed_size is not None:
+                self.head = b''
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def parse_header(self):
+        """Try to read dimensions from the bytes received so far"""
+        from PIL import Image
+
+        try:
+            image = Image.open(BytesIO(self.head))
+        except Exception:
+            # Header not complete yet
+            return
+        self.sniffed_size = image.size
+        max_pixels = getattr(settings, 'MAX_UPLOAD_PIXELS', None)
+        if max_pixels and image.size[0] * image.size[1] > max_pixels:
+            self.reject(
+                f'Image is too large ({image.size[0]}x{image.size[1]}); '
+                f'the limit is {max_pixels // 1_000_000} megapixels.'
+            )
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.content_hash = self.hasher.hexdigest()
+        return uploaded_file
@@ -1,12 +1,23 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = 'images'
 
+# Canonical UUIDs only, as accepted by the <uuid:> converter, so every image
+# has exactly one set of derivative URLs and cache keys
+UUID_PATTERN = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
 urlpatterns = [
     path('upload/', views.ImageUploadView.as_view(), name='upload'),
     path('result/<uuid:image_id>/', views.ImageResultView.as_view(), name='result'),
     path('download/<uuid:image_id>/', views.ImageDownloadView.as_view(), name='download'),
     path('gallery/', views.ImageGalleryView.as_view(), name='gallery'),
+    path('export/', views.ImageExportView.as_view(), name='export'),
+    path('preview/', views.FilterPreviewView.as_view(), name='preview'),
+    path('progress/<uuid:progress_id>/', views.ImageProgressView.as_view(), name='progress'),
+    re_path(
+        rf'^(?P<image_id>{UUID_PATTERN})/(?P<filter_key>[\w:-]+)/(?P<width>\d+)x(?P<height>\d+)\.(?P<extension>jpg|png|webp)$',
+        views.ImageDerivativeView.as_view(), name='derivative'
+    ),
     path('process/', views.ProcessImageView.as_view(), name='process'),
 ]
@@ -1,78 +1,150 @@
 from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponse
+from django.urls import reverse
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.core.files.base import ContentFile
 from django.conf import settings
+from django.db import router
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, View
 from django.views.generic.edit import FormView
-from io import BytesIO  # ADD THIS LINE
+import mimetypes
 import os
-import tempfile
-from PIL import Image
+import re
+from functools import partial
 from .models import ProcessedImage
-from .forms import ImageUploadForm
+from .forms import ImageExportForm, ImageUploadForm
+from .idempotency import IdempotentPostMixin
+from .upload_handlers import InspectingUploadHandler
+from .derivatives import get_derivative
+from .export import stream_zip
+from .near_duplicates import find_near_duplicate
+from .previews import render_previews, store_preview_source
+from .progress import format_event, get_progress_events, parse_last_event_id, report_progress
+from .cache import GALLERY_NAMESPACE, get_image_metadata, get_parsed_lut, image_namespace
+from apps.common.utils.cache import CachedPageMixin
 from apps.common.utils.image_filters import ImageProcessor
+from apps.common.utils.image_metadata import LazyImage
+from apps.common.utils.memory import get_memory_profile
+from apps.common.utils.perceptual_hash import image_dhash, to_signed
+from apps.storage.utils.parallel import save_field_files
 from apps.storage.utils.s3_manager import S3Manager
 
 
-class ImageUploadView(FormView):
+# Render progress events that start a new memory profiling stage
+PROFILED_STAGES = {'filtering': 'filter', 'encoding': 'encode'}
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ImageUploadView(IdempotentPostMixin, FormView):
     """View for image upload form"""
     template_name = 'images/upload.html'
     form_class = ImageUploadForm
     success_url = '/images/result/'
+    # Retries of a slow upload get the first upload's result
+    idempotency_scope = 'upload'
+    idempotent_replay_message = 'This upload was already processed, so its result is shown.'
+    
+    def dispatch(self, request, *args, **kwargs):
+        # Upload handlers can only be swapped before request.POST is read,
+        # which CsrfViewMiddleware would do, so CSRF is checked here instead
+        request.upload_handlers = [InspectingUploadHandler(request)]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+    
+    def form_invalid(self, form):
+        rejection = getattr(self.request, 'upload_rejection', None)
+        if rejection:
+            messages.error(self.request, rejection)
+        return super().form_invalid(form)
     
     def form_valid(self, form):
+        progress_id = form.cleaned_data.get('progress_id')
+        report = partial(report_progress, str(progress_id) if progress_id else None)
+        profile = get_memory_profile(self.request)
+        
+        def progress(stage, **data):
+            # Render stages double as memory profiling stage boundaries
+            if stage in PROFILED_STAGES:
+                profile.begin(PROFILED_STAGES[stage])
+            report(stage, **data)
+        
         try:
             # Get form data
             uploaded_file = form.cleaned_data['original_image']
             filter_type = form.cleaned_data['filter_type']
+            lut = form.cleaned_data.get('lut')
             
             print(f"Processing image: {uploaded_file.name}, filter: {filter_type}")
             
-            # CRITICAL: Read file content BEFORE saving to S3
-            # Once saved to S3, the file object may be closed or unavailable
-            uploaded_file.seek(0)  # Reset to beginning
-            file_content = uploaded_file.read()
-            file_size = len(file_content)
-            uploaded_file.seek(0)  # Reset again for saving
+            # The upload handler spooled the file to disk and hashed it on
+            # the way in. Read dimensions, format and orientation from the
+            # spooled file's header only; pixels are not decoded until the
+            # filter needs them
+            lazy_img = LazyImage(uploaded_file)
+            metadata = lazy_img.metadata
+            profile.tag(filter_type=filter_type, width=metadata['width'], height=metadata['height'])
+            # Hashing may decode the image already, so it counts as decoding
+            profile.begin('decode')
             
-            # Open image from the file content we just read
-            original_img = Image.open(BytesIO(file_content))
+            # A recompressed copy (same size, format and frame count) of an
+            # image that was already processed with this filter reuses that result
+            perceptual_hash = image_dhash(lazy_img)
+            duplicate = find_near_duplicate(perceptual_hash, filter_type, metadata, lut)
+            if duplicate is not None:
+                print(f"Reusing near-duplicate result: {duplicate.id}")
+                progress(
+                    'stored', image_id=str(duplicate.id),
+                    url=reverse('images:result', kwargs={'image_id': duplicate.id})
+                )
+                messages.info(
+                    self.request,
+                    'This image was already processed with the same filter, so the existing result is shown.'
+                )
+                return redirect('images:result', image_id=duplicate.id)
             
-            # Create ProcessedImage instance and save
-            processed_image = ProcessedImage(
-                original_image=uploaded_file,
-                filter_type=filter_type
+            # Apply filter (decodes and orients the image on first access;
+            # animated images are filtered frame by frame). This must happen
+            # before the original is saved: storage backends may move or
+            # close the uploaded file.
+            encoding = {}
+            processed_content, extension = ImageProcessor.render(
+                lazy_img, filter_type, get_parsed_lut(lut) if lut else None, progress, encoding
             )
-            processed_image.save()
+            profile.begin('store')
             
-            print(f"Saved ProcessedImage with ID: {processed_image.id}")
+            # Create ProcessedImage instance with its metadata
+            processed_image = ProcessedImage(
+                filter_type=filter_type,
+                lut=lut,
+                filter_version=ImageProcessor.get_filter_version(filter_type),
+                width=metadata['width'],
+                height=metadata['height'],
+                file_size=uploaded_file.size,
+                content_hash=getattr(uploaded_file, 'content_hash', ''),
+                perceptual_hash=to_signed(perceptual_hash),
+                image_format=metadata['format'],
+                color_mode=metadata['mode'],
+                frame_count=metadata['n_frames'],
+                orientation=metadata['orientation'],
+                **encoding,
+            )
             
-            # Store image dimensions
-            processed_image.width = original_img.width
-            processed_image.height = original_img.height
-            processed_image.file_size = file_size
+            # Write the original and the processed image to storage at the
+            # same time, then insert the row once both are stored
+            save_field_files(processed_image, {
+                'original_image': (uploaded_file.name, uploaded_file),
+                'processed_image': (
+                    f'processed_{processed_image.id}_{filter_type}.{extension}',
+                    ContentFile(processed_content),
+                ),
+            })
             processed_image.save()
             
-            # Apply filter
-            filtered_img = ImageProcessor.process_image(original_img, filter_type)
-            
-            # Convert to RGB if necessary (JPEG doesn't support RGBA)
-            if filtered_img.mode in ('RGBA', 'LA', 'P'):
-                filtered_img = filtered_img.convert('RGB')
-            
-            # Save processed image temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                filtered_img.save(tmp_file.name, 'JPEG')
-                tmp_path = tmp_file.name
-            
-            # Save processed image to model
-            with open(tmp_path, 'rb') as f:
-                processed_image.processed_image.save(
-                    f'processed_{processed_image.id}_{filter_type}.jpg',
-                    ContentFile(f.read()),
-                    save=True
-                )
+            print(f"Saved ProcessedImage with ID: {processed_image.id}")
             
             # Upload to S3 if configured (only if not already using S3 storage)
             # If using S3 storage backend, files are already uploaded to S3
@@ -84,7 +156,7 @@ class ImageUploadView(FormView):
                 
                 try:
                     s3_manager = S3Manager()
-                    s3_key = s3_manager.generate_s3_key(processed_image.id, filter_type)
+                    s3_key = s3_manager.generate_s3_key(processed_image.id, filter_type, extension)
                     # Try to get path, if not available (S3), use the file object
                     try:
                         processed_path = processed_image.processed_image.path
@@ -93,7 +165,9 @@ class ImageUploadView(FormView):
                         processed_image.s3_url = processed_image.processed_image.url
                         processed_image.save()
                     else:
-                        s3_url = s3_manager.upload_image(processed_path, s3_key)
+                        s3_url = s3_manager.upload_image(
+                            processed_path, s3_key, mimetypes.guess_type(processed_path)[0]
+                        )
                         if s3_url:
                             processed_image.s3_url = s3_url
                             processed_image.save()
@@ -101,9 +175,10 @@ class ImageUploadView(FormView):
                     print(f"Warning: Could not upload to S3: {str(e)}")
                     # Continue without S3 URL
             
-            # Clean up temporary file
-            os.unlink(tmp_path)
-            
+            progress(
+                'stored', image_id=str(processed_image.id),
+                url=reverse('images:result', kwargs={'image_id': processed_image.id})
+            )
             messages.success(self.request, 'Image processed successfully!')
             return redirect('images:result', image_id=processed_image.id)
             
@@ -111,49 +186,181 @@ class ImageUploadView(FormView):
             print(f"Error processing image: {str(e)}")
             import traceback
             traceback.print_exc()
+            progress('failed', error=str(e))
+            # A retry with the same idempotency key should try again
+            self.idempotent_store = False
             messages.error(self.request, f'Error processing image: {str(e)}')
             return redirect('images:upload')
 
 
-class ImageResultView(TemplateView):
+class ImageResultView(CachedPageMixin, TemplateView):
     """View for displaying processed image result"""
     template_name = 'images/result.html'
+    replica_reads = True
+    
+    def get_cache_namespace(self):
+        return image_namespace(self.kwargs['image_id'])
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         image_id = self.kwargs['image_id']
-        context['processed_image'] = get_object_or_404(ProcessedImage, id=image_id)
+        context['processed_image'] = get_object_or_404(
+            ProcessedImage.objects.select_related('lut'), id=image_id
+        )
         return context
 
 
+def download_etag(request, image_id):
+    """Validator for a processed image: its source content and filter output version"""
+    metadata = get_image_metadata(image_id)
+    source = metadata['content_hash'][:16] or str(image_id)
+    return f"{source}-{metadata['filter_type']}-v{metadata['filter_version']}-{metadata['updated_at'].timestamp():.0f}"
+
+
+def download_last_modified(request, image_id):
+    return get_image_metadata(image_id)['updated_at']
+
+
 class ImageDownloadView(View):
     """View for downloading processed images"""
+    replica_reads = True
     
     def get(self, request, image_id):
-        processed_image = get_object_or_404(ProcessedImage, id=image_id)
+        response = self.conditional_get(request, image_id)
+        if response.status_code in (200, 304):
+            # Also sent with 304s so caches keep the same policy
+            if request.GET.get('v') == str(get_image_metadata(image_id)['filter_version']):
+                # Versioned links change whenever the output is regenerated
+                patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+            else:
+                patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+    
+    @method_decorator(condition(etag_func=download_etag, last_modified_func=download_last_modified))
+    def conditional_get(self, request, image_id):
+        metadata = get_image_metadata(image_id)
         
-        if processed_image.processed_image:
-            response = HttpResponse(
-                processed_image.processed_image.read(),
-                content_type='image/jpeg'
-            )
-            response['Content-Disposition'] = f'attachment; filename="processed_{processed_image.filter_type}_{image_id}.jpg"'
+        if metadata['processed_image']:
+            storage = ProcessedImage._meta.get_field('processed_image').storage
+            with storage.open(metadata['processed_image'], 'rb') as f:
+                content = f.read()
+            extension = os.path.splitext(metadata['processed_image'])[1] or '.jpg'
+            content_type = mimetypes.guess_type(metadata['processed_image'])[0] or 'image/jpeg'
+            response = HttpResponse(content, content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="processed_{metadata["filter_type"]}_{image_id}{extension}"'
             return response
         else:
             messages.error(request, 'Processed image not found.')
             return redirect('core:home')
 
 
-class ImageGalleryView(TemplateView):
+class ImageExportView(View):
+    """Stream a ZIP archive of the selected processed images
+    
+    The archive is assembled while it is sent, from storage reads, so
+    exports of any size use no temporary files and constant memory.
+    """
+    replica_reads = True
+    
+    def get(self, request):
+        form = ImageExportForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        # Rows are fetched while streaming, after the middleware has
+        # finished, so pin the queryset to the database chosen now
+        images = form.get_queryset().using(router.db_for_read(ProcessedImage))
+        if not images.exists():
+            return JsonResponse({'error': 'No processed images match the selection.'}, status=404)
+        
+        response = StreamingHttpResponse(stream_zip(images), content_type='application/zip')
+        filename = f"images_{timezone.now():%Y%m%d_%H%M%S}.zip"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Pass chunks straight through instead of spooling them in nginx
+        response['X-Accel-Buffering'] = 'no'
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+
+class ImageDerivativeView(View):
+    """Serve a resized, filtered variant of an image, rendering it on first request"""
+    replica_reads = True
+    
+    def get(self, request, image_id, filter_key, width, height, extension):
+        args = (image_id, filter_key, int(width), int(height), extension)
+        path, content_type = get_derivative(*args)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            # Evicted between lookup and open
+            path, content_type = get_derivative(*args)
+            f = open(path, 'rb')
+        response = FileResponse(f, content_type=content_type)
+        # The URL fully determines the content, so browsers and nginx may
+        # keep it for good
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+
+class ImageGalleryView(CachedPageMixin, TemplateView):
     """View for displaying image gallery"""
     template_name = 'images/gallery.html'
+    cache_namespace = GALLERY_NAMESPACE
+    replica_reads = True
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['processed_images'] = ProcessedImage.objects.all()
+        context['processed_images'] = ProcessedImage.objects.select_related('lut')
+        context['filter_choices'] = ProcessedImage.TYPE_CHOICES
         return context
 
 
+class FilterPreviewView(View):
+    """API view returning low-resolution previews of every filter
+    
+    POST either an ``image`` (ideally already downscaled by the browser)
+    or the ``token`` returned by an earlier call, which reuses the cached
+    thumbnail of that upload.
+    """
+    
+    def post(self, request):
+        uploaded_file = request.FILES.get('image')
+        if uploaded_file is not None:
+            if uploaded_file.size > settings.PREVIEW_MAX_UPLOAD_BYTES:
+                return JsonResponse({'error': 'Image is too large to preview.'}, status=413)
+            try:
+                token = store_preview_source(uploaded_file)
+            except Exception as e:
+                return JsonResponse({'error': f'Could not read image: {str(e)}'}, status=400)
+        else:
+            token = request.POST.get('token', '')
+            if not re.fullmatch(r'[0-9a-f]{64}', token):
+                return JsonResponse({'error': 'An image or token is required.'}, status=400)
+        
+        previews = render_previews(token)
+        if previews is None:
+            return JsonResponse({'error': 'Preview expired, please upload again.'}, status=410)
+        return JsonResponse({'token': token, 'previews': previews})
+
+
+class ImageProgressView(View):
+    """Fallback for the upload progress stream when not served over ASGI
+    
+    Under ASGI, config.asgi answers this URL with a long-lived stream.
+    Here every request returns the events so far and asks EventSource to
+    reconnect shortly, resuming from Last-Event-ID.
+    """
+    
+    def get(self, request, progress_id):
+        events = get_progress_events(str(progress_id))
+        start = parse_last_event_id(request.headers.get('Last-Event-ID'))
+        body = b'retry: 1000\n\n' + b''.join(
+            format_event(index, events[index]) for index in range(start, len(events))
+        )
+        response = HttpResponse(body, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
 class ProcessImageView(View):
     """API view for processing images via AJAX"""
     
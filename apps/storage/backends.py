@@ -0,0 +1,123 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+from .utils.disk_cache import LRUDiskCache
+
+STATS_KEYS = ('hits', 'misses', 'hit_bytes', 'miss_bytes', 'miss_ms')
+
+
+def _incr(name, delta):
+    key = f'tiered_storage:{name}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, None)
+
+
+def get_tier_stats():
+    """Return shared hit/miss counters and the savings they imply"""
+    values = cache.get_many([f'tiered_storage:{name}' for name in STATS_KEYS])
+    stats = {name: values.get(f'tiered_storage:{name}', 0) for name in STATS_KEYS}
+    requests = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(100 * stats['hits'] / requests, 1) if requests else None
+    # Each hit avoided one backend GET; estimate its cost from observed misses
+    avg_miss_ms = stats['miss_ms'] / stats['misses'] if stats['misses'] else 0
+    stats['avg_miss_ms'] = round(avg_miss_ms, 1)
+    stats['saved_seconds'] = round(stats['hits'] * avg_miss_ms / 1000, 1)
+    stats['saved_bytes'] = stats['hit_bytes']
+    return stats
+
+
+@deconstructible
+class TieredStorage(Storage):
+    """Storage that keeps a local LRU disk tier in front of another backend
+
+    Reads are served from the local tier when possible and fetched from the
+    backend (normally S3) and cached otherwise. Saves write through to both.
+    Everything else, including URLs, is delegated to the backend.
+    """
+
+    def __init__(self, backend=None, cache_dir=None, max_bytes=None):
+        backend = backend or settings.TIERED_STORAGE_BACKEND
+        self.backend = import_string(backend)()
+        self.disk_cache = LRUDiskCache(
+            cache_dir or settings.TIERED_STORAGE_CACHE_DIR,
+            max_bytes or settings.TIERED_STORAGE_MAX_BYTES,
+        )
+
+    def _open(self, name, mode='rb'):
+        if 'r' not in mode or '+' in mode:
+            return self.backend.open(name, mode)
+
+        path = self.disk_cache.get(name)
+        if path is not None:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted between lookup and open; fall through to a fetch
+                pass
+            else:
+                _incr('hits', 1)
+                _incr('hit_bytes', File(f).size)
+                return File(f, name=name)
+
+        start = time.monotonic()
+        with self.backend.open(name, 'rb') as remote:
+            path = self.disk_cache.put(name, remote.chunks())
+        _incr('misses', 1)
+        _incr('miss_ms', int((time.monotonic() - start) * 1000))
+        f = open(path, 'rb')
+        _incr('miss_bytes', File(f).size)
+        return File(f, name=name)
+
+    def _save(self, name, content):
+        # Fill the local tier first; some backends move or consume the
+        # uploaded file while saving it
+        content.seek(0)
+        self.disk_cache.put(name, content.chunks())
+        content.seek(0)
+        # save() has already picked an available name through the backend;
+        # backend.save() would check it again
+        saved_name = self.backend._save(name, content)
+        if saved_name != name:
+            self.disk_cache.discard(name)
+        return saved_name
+
+    def delete(self, name):
+        self.disk_cache.discard(name)
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
@@ -0,0 +1,15 @@
+from storages.backends.s3boto3 import S3Boto3Storage
+
+
+class MediaS3Storage(S3Boto3Storage):
+    """S3 storage for uploaded and processed images
+
+    A stored name is never reused for different content (upload_to
+    callables make every name unique), so objects can be cached by browsers
+    and CDNs for a year without revalidation. For the same reason names are
+    not checked with a HEAD request before each write.
+    """
+    file_overwrite = True
+    object_parameters = {
+        'CacheControl': 'public, max-age=31536000, immutable',
+    }
@@ -0,0 +1,10 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from apps.core.testing import QueryBudgetMixin
+
+
+class StorageStatsQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_stats(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.assertQueryBudget('/storage/stats/', cold=4, warm=4, user=user)
@@ -0,0 +1,120 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LRUDiskCache:
+    """Byte-bounded on-disk cache with least-recently-used eviction
+
+    Entries are plain files named by a hash of their key, so the cache can
+    be shared by every worker process on a host: writes go to a temporary
+    file and are renamed into place atomically, recency is tracked through
+    file mtimes, and eviction runs under an exclusive ``flock`` so only one
+    worker scans the directory at a time.
+    """
+
+    # Fraction of max_bytes to evict down to, so eviction is not re-run
+    # on every write once the cache is full
+    LOW_WATERMARK = 0.9
+    # Re-scan the cache after this fraction of max_bytes has been written
+    SCAN_FRACTION = 0.05
+
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = int(max_bytes)
+        self._written_since_scan = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def get(self, key):
+        """Return the cached file path for key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            # Touch to mark the entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, chunks):
+        """Store an iterable of byte chunks under key and return its path"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self._written_since_scan += size
+        if self._written_since_scan >= self.max_bytes * self.SCAN_FRACTION:
+            self._written_since_scan = 0
+            self.evict()
+        return path
+
+    def discard(self, key):
+        try:
+            os.unlink(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """Yield (mtime, size, path) for every cached file"""
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        """Delete least recently used entries until under the low watermark"""
+        lock_path = os.path.join(self.directory, '.lock')
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is already evicting
+                return 0
+
+            try:
+                entries = sorted(self.entries())
+                total = sum(size for _, size, _ in entries)
+                if total <= self.max_bytes:
+                    return 0
+
+                target = self.max_bytes * self.LOW_WATERMARK
+                removed = 0
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        continue
+                    total -= size
+                    removed += 1
+                logger.info(f"Evicted {removed} entries from disk cache {self.directory}")
+                return removed
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
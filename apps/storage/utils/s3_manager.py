@@ -1,7 +1,6 @@
-import boto3
 from django.conf import settings
-from botocore.exceptions import ClientError
 import logging
+from .sharding import sharded_name
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +9,9 @@ class S3Manager:
     """AWS S3 utility class for uploading and managing images"""
     
     def __init__(self):
+        # boto3 is slow to import, so only load it when S3 is actually used
+        import boto3
+        
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
@@ -18,8 +20,10 @@ class S3Manager:
         )
         self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
     
-    def upload_image(self, file_path, s3_key):
+    def upload_image(self, file_path, s3_key, content_type='image/jpeg'):
         """Upload image to S3 bucket"""
+        from botocore.exceptions import ClientError
+        
         try:
             self.s3_client.upload_file(
                 file_path,
@@ -27,7 +31,7 @@ class S3Manager:
                 s3_key,
                 ExtraArgs={
                     'ACL': 'public-read',
-                    'ContentType': 'image/jpeg'
+                    'ContentType': content_type or 'image/jpeg'
                 }
             )
             
@@ -41,6 +45,8 @@ class S3Manager:
     
     def delete_image(self, s3_key):
         """Delete image from S3 bucket"""
+        from botocore.exceptions import ClientError
+        
         try:
             self.s3_client.delete_object(
                 Bucket=self.bucket_name,
@@ -52,11 +58,17 @@ class S3Manager:
             return False
     
     def generate_s3_key(self, image_id, filter_type, file_extension='jpg'):
-        """Generate S3 key for processed image"""
-        return f"processed_images/{image_id}_{filter_type}.{file_extension}"
+        """Generate S3 key for processed image
+        
+        Keys are spread over hash-derived prefixes so request load is not
+        concentrated on a single S3 partition
+        """
+        return sharded_name('processed_images', image_id, f"{image_id}_{filter_type}.{file_extension}")
     
     def get_bucket_stats(self):
         """Get S3 bucket statistics"""
+        from botocore.exceptions import ClientError
+        
         try:
             response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
             return {
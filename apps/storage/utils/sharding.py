@@ -0,0 +1,20 @@
+import hashlib
+import os
+
+# Two levels of two hex characters: 65536 prefixes, so writes spread over
+# many S3 partitions and no local directory grows without bound
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def shard_prefix(value):
+    """Stable hash-derived prefix for a key, e.g. '3f/a2'"""
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return '/'.join(
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH] for level in range(SHARD_LEVELS)
+    )
+
+
+def sharded_name(base, value, filename):
+    """Join base, the shard prefix of value and the file's base name"""
+    return f'{base}/{shard_prefix(value)}/{os.path.basename(filename)}'
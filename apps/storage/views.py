@@ -1,6 +1,12 @@
 from django.views.generic import TemplateView
 from django.http import JsonResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import timedelta
+from apps.images.models import FilterDailyStats, ProcessedImage
+from .backends import TieredStorage, get_tier_stats
 from .utils.s3_manager import S3Manager
 
 
@@ -39,4 +45,28 @@ class StorageStatsView(LoginRequiredMixin, TemplateView):
         except Exception as e:
             context['s3_error'] = str(e)
         
+        # Per-filter and per-day totals come from the precomputed summary
+        # table, so this stays cheap no matter how many images exist
+        totals = dict(
+            image_count=Sum('image_count'),
+            total_bytes=Sum('total_bytes'),
+            total_pixels=Sum('total_pixels'),
+        )
+        filter_names = dict(ProcessedImage.TYPE_CHOICES)
+        filter_stats = list(
+            FilterDailyStats.objects.values('filter_type').annotate(**totals).order_by('filter_type')
+        )
+        for row in filter_stats:
+            row['filter_name'] = filter_names.get(row['filter_type'], row['filter_type'])
+        context['filter_stats'] = filter_stats
+        context['daily_stats'] = (
+            FilterDailyStats.objects
+            .filter(day__gt=timezone.localdate() - timedelta(days=7))
+            .values('day').annotate(**totals).order_by('-day')
+        )
+        
+        # Local disk tier hit/miss counters
+        if isinstance(default_storage, TieredStorage):
+            context['tier_stats'] = get_tier_stats()
+        
         return context
@@ -2,15 +2,40 @@
 ASGI config for image_processing_app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Upload progress streams (server-sent events) are served here directly,
+without the Django middleware stack, so an open stream holds no worker
+thread. Deployments route only /images/progress/ here. Other requests
+fall through to Django's ASGI handler, which spools request bodies and
+buffers sync streaming responses, so views are served over WSGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
+import re
+import uuid
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from apps.images.progress import progress_stream  # noqa: E402
+
+PROGRESS_PATH = re.compile(r'^/images/progress/(?P<progress_id>[0-9a-fA-F-]{36})/$')
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        match = PROGRESS_PATH.match(scope['path'])
+        if match:
+            try:
+                progress_id = str(uuid.UUID(match.group('progress_id')))
+            except ValueError:
+                pass
+            else:
+                return await progress_stream(scope, receive, send, progress_id)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,40 @@
+"""
+Gunicorn configuration for image_processing_app project.
+
+Command-line flags override these values. Set GUNICORN_PRELOAD=true to load
+the application and run the warm-up hook (apps.core.warmup) once in the
+master, so every forked worker starts with NumPy, Pillow, boto3, the URLconf
+and templates already imported.
+
+Django views run as config.wsgi:application on the sync workers below.
+Upload progress streams are served by a second process running
+config.asgi:application with uvicorn.workers.UvicornWorker, and nginx
+routes only /images/progress/ there. Django's ASGI handler reads the whole
+request body before a view runs and collects sync streaming responses into
+a list, which would defeat early upload rejection and streamed ZIP exports.
+Without the ASGI process the progress URL falls back to short polling.
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '3'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+
+def when_ready(server):
+    """Warm the master before workers are forked (only with preload_app)"""
+    if not server.cfg.preload_app:
+        return
+    from apps.core.warmup import warm_up
+    elapsed = warm_up()
+    server.log.info(f"Pre-fork warm-up finished in {elapsed * 1000:.0f} ms")
+
+
+def post_fork(server, worker):
+    """Never share database connections opened in the master with workers"""
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
@@ -3,6 +3,7 @@ Base settings for Image Processing Application.
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,7 +38,11 @@ INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves /static/ before any other middleware does work
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.core.middleware.MemoryProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -73,6 +78,14 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases in DATABASES that receive the reads of views
+# with replica_reads = True. Settings modules add the aliases, each with
+# TEST = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['apps.core.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+# How long a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,6 +114,11 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+# collectstatic writes content-hashed copies (custom.<hash>.css) plus
+# .gz and, when the Brotli package is installed, .br siblings. Hashed
+# files are served with a one-year immutable Cache-Control by WhiteNoise,
+# or by nginx straight from STATIC_ROOT
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Media files
 MEDIA_URL = '/media/'
@@ -127,6 +145,79 @@ AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
 }
 
+# Uploads larger than this many pixels are rejected while still streaming
+MAX_UPLOAD_PIXELS = int(os.environ.get('MAX_UPLOAD_PIXELS', '100000000'))
+# Animated WebP results are encoded from all frames at once, so animations
+# with more frames x pixels than this are rejected before decoding
+MAX_BUFFERED_ANIMATION_PIXELS = int(os.environ.get('MAX_BUFFERED_ANIMATION_PIXELS', '50000000'))
+
+# Reuse the existing result when an upload's perceptual hash is within this
+# many bits (of 64) of an earlier upload processed with the same filter and
+# with the same size, format and frame count; off unless enabled
+NEAR_DUPLICATE_REUSE = os.environ.get('NEAR_DUPLICATE_REUSE', 'false').lower() == 'true'
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.environ.get('NEAR_DUPLICATE_MAX_DISTANCE', '6'))
+
+# Upload requests carrying an Idempotency-Key run once; the
+# response is replayed to retries for IDEMPOTENCY_TTL seconds. Duplicates
+# wait up to IDEMPOTENCY_WAIT seconds (below nginx's 60 s read timeout)
+# for a run in progress, whose claim expires after IDEMPOTENCY_LOCK_TIMEOUT
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', str(24 * 60 * 60)))
+IDEMPOTENCY_WAIT = int(os.environ.get('IDEMPOTENCY_WAIT', '50'))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', '300'))
+
+# Results are encoded at the lowest JPEG quality in [JPEG_MIN_QUALITY,
+# JPEG_MAX_QUALITY] whose SSIM reaches JPEG_TARGET_SSIM, and at most
+# JPEG_MAX_BYTES when set (0 means no byte budget). JPEG_ADAPTIVE=false
+# restores Pillow's fixed default quality
+JPEG_ADAPTIVE = os.environ.get('JPEG_ADAPTIVE', 'true').lower() == 'true'
+JPEG_TARGET_SSIM = float(os.environ.get('JPEG_TARGET_SSIM', '0.97'))
+JPEG_MAX_BYTES = int(os.environ.get('JPEG_MAX_BYTES', '0'))
+JPEG_MIN_QUALITY = int(os.environ.get('JPEG_MIN_QUALITY', '50'))
+JPEG_MAX_QUALITY = int(os.environ.get('JPEG_MAX_QUALITY', '95'))
+
+# Live filter previews on the upload page
+PREVIEW_SIZE = int(os.environ.get('PREVIEW_SIZE', '192'))
+PREVIEW_MAX_UPLOAD_BYTES = int(os.environ.get('PREVIEW_MAX_UPLOAD_BYTES', str(2 * 1024 * 1024)))
+PREVIEW_CACHE_TIMEOUT = int(os.environ.get('PREVIEW_CACHE_TIMEOUT', '600'))
+# Non-JPEG previews are decoded at full size before thumbnailing
+PREVIEW_MAX_SOURCE_PIXELS = int(os.environ.get('PREVIEW_MAX_SOURCE_PIXELS', '16000000'))
+
+# Local disk caches default to the system temp directory, outside the
+# source tree; point them at persistent storage in production
+LOCAL_CACHE_ROOT = Path(tempfile.gettempdir()) / 'image_processing'
+
+# Local disk tier for apps.storage.backends.TieredStorage
+TIERED_STORAGE_BACKEND = 'django.core.files.storage.FileSystemStorage'
+TIERED_STORAGE_CACHE_DIR = os.environ.get('TIERED_STORAGE_CACHE_DIR', str(LOCAL_CACHE_ROOT / 'storage_cache'))
+TIERED_STORAGE_MAX_BYTES = int(os.environ.get('TIERED_STORAGE_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+# On-demand derivatives (/images/<id>/<filter>/<w>x<h>.<fmt>)
+DERIVATIVE_CACHE_DIR = os.environ.get('DERIVATIVE_CACHE_DIR', str(LOCAL_CACHE_ROOT / 'derivative_cache'))
+DERIVATIVE_CACHE_MAX_BYTES = int(os.environ.get('DERIVATIVE_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+DERIVATIVE_MAX_SIZE = int(os.environ.get('DERIVATIVE_MAX_SIZE', '2048'))
+# Comma-separated WxH sizes to allow (0 keeps the aspect ratio); "*" allows
+# any size up to DERIVATIVE_MAX_SIZE
+DERIVATIVE_ALLOWED_SIZES = [
+    size for size in os.environ.get(
+        'DERIVATIVE_ALLOWED_SIZES', '160x0,320x0,640x0,1280x0,1920x0,160x160,320x320'
+    ).split(',') if size
+]
+
+# Memory profiling (apps.core.middleware.MemoryProfilingMiddleware)
+# Requests sending X-Memory-Profile: <token> are always profiled; others
+# are sampled at this rate (0 disables sampling, 1 profiles everything)
+MEMORY_PROFILE_TOKEN = os.environ.get('MEMORY_PROFILE_TOKEN', '')
+MEMORY_PROFILE_SAMPLE_RATE = float(os.environ.get('MEMORY_PROFILE_SAMPLE_RATE', '0'))
+
+# Page caching
+# Rendered pages are cached under versioned keys that are bumped by
+# ProcessedImage save/delete signals, so this only bounds staleness of
+# pages that have no model-driven invalidation.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '300'))
+# Identifies the deployed build in page cache keys; when unset, the hash of
+# the static files manifest is used
+RELEASE_ID = os.environ.get('RELEASE_ID', '')
+
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -17,6 +17,13 @@ DATABASES = {
     }
 }
 
+# Simulated read replicas (DEV_DATABASE_REPLICAS=2 adds replica1 and
+# replica2) so replica routing can be exercised locally; they share the
+# primary's file, and the SQL debug log shows which alias ran each query
+for index in range(1, int(os.environ.get('DEV_DATABASE_REPLICAS', '0')) + 1):
+    DATABASES[f'replica{index}'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
 # Email backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -31,6 +38,8 @@ CACHES = {
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+# Serve source files as-is so no collectstatic run is needed
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 
 # Media files for development
 MEDIA_URL = '/media/'
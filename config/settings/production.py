@@ -31,6 +31,12 @@ DATABASES = {
     }
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_HOSTS=replica-1.example.com,replica-2.example.com
+replica_hosts = [host.strip() for host in os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',') if host.strip()]
+for index, host in enumerate(replica_hosts, 1):
+    DATABASES[f'replica{index}'] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
 # Security settings for production
 # Only enable HTTPS redirect if explicitly set (for HTTP Load Balancer, keep False)
 SECURE_SSL_REDIRECT = os.environ.get('SECURE_SSL_REDIRECT', 'False').lower() == 'true'
@@ -71,7 +77,8 @@ CACHES = {
     }
 }
 
-# Static and Media files for production (use S3 if configured)
+# Media files for production (use S3 if configured). Static files are
+# always collected locally and served by WhiteNoise or nginx, see base.py
 if os.environ.get('USE_S3_STORAGE', 'true').lower() == 'true' and os.environ.get('AWS_STORAGE_BUCKET_NAME'):
     # AWS S3 Configuration
     AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME', 'us-east-1')
@@ -91,23 +98,18 @@ if os.environ.get('USE_S3_STORAGE', 'true').lower() == 'true' and os.environ.get
     AWS_QUERYSTRING_AUTH = False
     AWS_QUERYSTRING_EXPIRE = 3600  # URL expiration (not needed for public files)
     
-    # Static files configuration for S3
-    STATIC_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/{AWS_LOCATION}/'
-    STATICFILES_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
     # Media files configuration for S3
     MEDIA_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/media/'
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
-else:
-    # Use local static files with WhiteNoise (temporary fallback)
-    STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-    MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-    STATIC_URL = '/static/'
+    # Uploads are never overwritten and are served as immutable
+    DEFAULT_FILE_STORAGE = 'apps.storage.s3.MediaS3Storage'
     
+    # Keep hot images on local disk in front of S3 (shared by all workers)
+    if os.environ.get('USE_TIERED_STORAGE', 'true').lower() == 'true':
+        TIERED_STORAGE_BACKEND = DEFAULT_FILE_STORAGE
+        DEFAULT_FILE_STORAGE = 'apps.storage.backends.TieredStorage'
+else:
     # Fallback to local storage
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-    
-    # Add WhiteNoise middleware after SecurityMiddleware
-    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+    MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Logging for production
 LOGGING['handlers']['file']['filename'] = '/var/log/django/image_processing.log'
@@ -129,8 +129,9 @@ collect_static() {
 
 # Setup systemd service
 setup_systemd() {
-    print_status "Setting up systemd service..."
+    print_status "Setting up systemd services..."
     
+    SECRET_KEY=$(openssl rand -base64 32)
     sudo tee /etc/systemd/system/$APP_NAME.service > /dev/null <<EOF
 [Unit]
 Description=Image Processing Django Application
@@ -142,20 +143,43 @@ User=$SERVICE_USER
 Group=$SERVICE_GROUP
 WorkingDirectory=$APP_DIR
 Environment=DJANGO_SETTINGS_MODULE=config.settings.production
-Environment=SECRET_KEY=$(openssl rand -base64 32)
+Environment=SECRET_KEY=$SECRET_KEY
 Environment=DEBUG=False
 ExecStart=$APP_DIR/venv/bin/gunicorn --bind unix:$APP_DIR/$APP_NAME.sock config.wsgi:application
 ExecReload=/bin/kill -s HUP \$MAINPID
 Restart=always
 RestartSec=3
 
+[Install]
+WantedBy=multi-user.target
+EOF
+
+    # Upload progress streams are served by a separate ASGI process
+    sudo tee /etc/systemd/system/$APP_NAME-events.service > /dev/null <<EOF
+[Unit]
+Description=Image Processing upload progress streams
+After=network.target
+
+[Service]
+Type=notify
+User=$SERVICE_USER
+Group=$SERVICE_GROUP
+WorkingDirectory=$APP_DIR
+Environment=DJANGO_SETTINGS_MODULE=config.settings.production
+Environment=SECRET_KEY=$SECRET_KEY
+Environment=DEBUG=False
+ExecStart=$APP_DIR/venv/bin/gunicorn --bind unix:$APP_DIR/$APP_NAME-events.sock --workers 1 --worker-class uvicorn.workers.UvicornWorker config.asgi:application
+ExecReload=/bin/kill -s HUP \$MAINPID
+Restart=always
+RestartSec=3
+
 [Install]
 WantedBy=multi-user.target
 EOF
 
     sudo systemctl daemon-reload
-    sudo systemctl enable $APP_NAME
-    sudo systemctl start $APP_NAME
+    sudo systemctl enable $APP_NAME $APP_NAME-events
+    sudo systemctl start $APP_NAME $APP_NAME-events
     
     print_status "Systemd service setup completed"
 }
@@ -177,6 +201,15 @@ server {
         alias $APP_DIR/media/;
     }
     
+    location ~ ^/images/progress/[0-9a-f-]{36}/\$ {
+        include proxy_params;
+        proxy_pass http://unix:$APP_DIR/$APP_NAME-events.sock;
+        proxy_http_version 1.1;
+        proxy_set_header Connection "";
+        proxy_buffering off;
+        proxy_read_timeout 300s;
+    }
+    
     location / {
         include proxy_params;
         proxy_pass http://unix:$APP_DIR/$APP_NAME.sock;
@@ -225,10 +225,32 @@ RestartSec=3
 WantedBy=multi-user.target
 EOF
     
-    # Start service
+    # Upload progress streams are served by a separate ASGI process
+    sudo tee /etc/systemd/system/$APP_NAME-events.service > /dev/null <<EOF
+[Unit]
+Description=Image Processing upload progress streams
+After=network.target postgresql.service
+
+[Service]
+Type=notify
+User=$SERVICE_USER
+Group=$SERVICE_GROUP
+WorkingDirectory=$APP_DIR
+Environment=DJANGO_SETTINGS_MODULE=config.settings.production
+EnvironmentFile=$APP_DIR/.env
+ExecStart=$APP_DIR/venv/bin/gunicorn --config gunicorn.conf.py --bind unix:$APP_DIR/$APP_NAME-events.sock --workers 1 --worker-class uvicorn.workers.UvicornWorker config.asgi:application
+ExecReload=/bin/kill -s HUP \$MAINPID
+Restart=always
+RestartSec=3
+
+[Install]
+WantedBy=multi-user.target
+EOF
+    
+    # Start services
     sudo systemctl daemon-reload
-    sudo systemctl enable $APP_NAME
-    sudo systemctl start $APP_NAME
+    sudo systemctl enable $APP_NAME $APP_NAME-events
+    sudo systemctl start $APP_NAME $APP_NAME-events
     
     print_status "Systemd service created and started"
 }
@@ -264,6 +286,16 @@ server {
         add_header Cache-Control "public, immutable";
     }
     
+    # Upload progress streams (ASGI)
+    location ~ ^/images/progress/[0-9a-f-]{36}/\$ {
+        include proxy_params;
+        proxy_pass http://unix:$APP_DIR/$APP_NAME-events.sock;
+        proxy_http_version 1.1;
+        proxy_set_header Connection "";
+        proxy_buffering off;
+        proxy_read_timeout 300s;
+    }
+    
     # Django application
     location / {
         include proxy_params;